@@ -0,0 +1,43 @@
+"""
+Benchmark de PgStorage.create_links_bulk (filas/segundo).
+
+Uso:
+    DATABASE_URL=postgresql://... python bench_bulk.py [1000 10000 100000]
+
+Inserta lotes sintéticos y los borra al terminar.
+"""
+from dotenv import load_dotenv
+load_dotenv()
+
+import sys, time
+from storage_pg import PgStorage
+
+def make_items(n: int):
+    return [
+        {
+            "url": f"https://example.org/bench/RESOLUC-{i}.pdf",
+            "title": f"Resolución {i} de benchmark",
+            "tags": ["bench", f"t{i % 10}"],
+            "notes": "fila sintética para medir la ingesta",
+        }
+        for i in range(n)
+    ]
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000]
+    storage = PgStorage()
+    try:
+        for n in sizes:
+            items = make_items(n)
+            t0 = time.perf_counter()
+            created = storage.create_links_bulk(items)
+            dt = time.perf_counter() - t0
+            print(f"{n:>7} filas  {dt:8.3f} s  {n / dt:>10.0f} filas/s")
+            ids = [c["id"] for c in created]
+            with storage._pool.connection() as conn, conn.cursor() as cur:
+                cur.execute("delete from links where id = any(%s::uuid[])", [ids])
+    finally:
+        storage.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import io, csv, json
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Union
+
+CSV_HEADER = ["id", "url", "title", "tags", "notes", "created_at", "updated_at"]
+
+Batch = List[Dict[str, Any]]
+Encoder = Callable[[Batch, bool], str]
+
+def _chunks(batches, head: str, encode: Encoder, tail: str) -> Union[Iterator[str], AsyncIterator[str]]:
+    # Los lotes pueden venir de un iterador normal (backends síncronos) o asíncrono
+    if hasattr(batches, "__aiter__"):
+        return _achunks(batches, head, encode, tail)
+    return _schunks(batches, head, encode, tail)
+
+def _schunks(batches, head: str, encode: Encoder, tail: str) -> Iterator[str]:
+    if head:
+        yield head
+    first = True
+    for batch in batches:
+        if batch:
+            yield encode(batch, first)
+            first = False
+    if tail:
+        yield tail
+
+async def _achunks(batches, head: str, encode: Encoder, tail: str) -> AsyncIterator[str]:
+    if head:
+        yield head
+    first = True
+    async for batch in batches:
+        if batch:
+            yield encode(batch, first)
+            first = False
+    if tail:
+        yield tail
+
+def _csv_row(i: Dict[str, Any]) -> List[Any]:
+    return [
+        i.get("id", ""),
+        i.get("url", ""),
+        i.get("title", ""),
+        ",".join(i.get("tags") or []),
+        i.get("notes", ""),
+        i.get("created_at", ""),
+        i.get("updated_at", ""),
+    ]
+
+def _csv_lines(rows) -> str:
+    output = io.StringIO()
+    csv.writer(output).writerows(rows)
+    return output.getvalue()
+
+def _csv_batch(batch: Batch, first: bool) -> str:
+    return _csv_lines(_csv_row(i) for i in batch)
+
+def csv_chunks(batches):
+    """Genera el CSV de export por trozos, uno por lote de filas."""
+    return _chunks(batches, _csv_lines([CSV_HEADER]), _csv_batch, "")
+
+
+def _json_default(v: Any) -> Any:
+    # Igual que jsonable_encoder: fechas en ISO 8601, el resto como texto (UUID, etc.)
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    return str(v)
+
+def _dumps(i: Dict[str, Any]) -> str:
+    return json.dumps(i, ensure_ascii=False, default=_json_default, separators=(",", ":"))
+
+def _json_batch(batch: Batch, first: bool) -> str:
+    body = ",".join(_dumps(i) for i in batch)
+    return body if first else "," + body
+
+def _ndjson_batch(batch: Batch, first: bool) -> str:
+    return "".join(_dumps(i) + "\n" for i in batch)
+
+def json_chunks(batches):
+    """Genera {"links": [...]} por trozos, con la misma forma que el export clásico."""
+    return _chunks(batches, '{"links":[', _json_batch, "]}")
+
+def ndjson_chunks(batches):
+    """Un objeto JSON por línea (NDJSON)."""
+    return _chunks(batches, "", _ndjson_batch, "")
@@ -0,0 +1,277 @@
+import os, time, asyncio
+import httpx
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from rate_limit import TokenBucket, DailyBudget
+
+GOOGLE_URL = "https://www.googleapis.com/customsearch/v1"
+
+# Tiempos (segundos) y tamaño del pool de conexiones hacia googleapis.com
+GOOGLE_CONNECT_TIMEOUT = float(os.getenv("GOOGLE_CONNECT_TIMEOUT", "3"))
+GOOGLE_READ_TIMEOUT = float(os.getenv("GOOGLE_READ_TIMEOUT", "10"))
+GOOGLE_MAX_CONNECTIONS = int(os.getenv("GOOGLE_MAX_CONNECTIONS", "20"))
+GOOGLE_KEEPALIVE = float(os.getenv("GOOGLE_KEEPALIVE", "60"))
+GOOGLE_HTTP2 = os.getenv("GOOGLE_HTTP2", "1").lower() in ("1", "true", "yes")
+
+# Caché de resultados: vigencia (segundos, 0 = sin caché) y máximo de consultas guardadas
+GOOGLE_CACHE_TTL = float(os.getenv("GOOGLE_CACHE_TTL", "3600"))
+GOOGLE_CACHE_SIZE = int(os.getenv("GOOGLE_CACHE_SIZE", "1024"))
+
+# Páginas pedidas a la vez a Google por cada búsqueda con start/pages
+GOOGLE_FANOUT = int(os.getenv("GOOGLE_FANOUT", "4"))
+
+# Límite de consultas a Google: ritmo por motor (por minuto, con ráfaga), presupuesto
+# diario compartido (misma API key; 0 = sin límite, el valor por defecto: cada
+# despliegue fija el suyo según su cuota) y qué hacer al superarlo:
+# "queue" espera hasta GOOGLE_QUEUE_TIMEOUT segundos, "shed" rechaza de inmediato
+GOOGLE_RATE_PER_MIN = float(os.getenv("GOOGLE_RATE_PER_MIN", "60"))
+GOOGLE_RATE_BURST = float(os.getenv("GOOGLE_RATE_BURST", "10"))
+GOOGLE_DAILY_BUDGET = int(os.getenv("GOOGLE_DAILY_BUDGET", "0"))
+GOOGLE_RATE_POLICY = os.getenv("GOOGLE_RATE_POLICY", "queue").lower()
+GOOGLE_QUEUE_TIMEOUT = float(os.getenv("GOOGLE_QUEUE_TIMEOUT", "10"))
+
+# Límites de la API: 10 resultados por página y nada más allá del resultado 100
+PAGE_SIZE = 10
+MAX_RESULTS = 100
+
+class SearchConfigError(Exception):
+    """Falta la API key o el CX del motor pedido."""
+
+class RateLimited(Exception):
+    """Se agotó el ritmo permitido o el presupuesto diario; `retry_after` en segundos."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def _http2_available() -> bool:
+    # HTTP/2 necesita el extra httpx[http2] (paquete h2)
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _credentials(engine: str):
+    api_key = os.getenv("GOOGLE_API_KEY")
+    cx_map = {
+        "legal": os.getenv("GOOGLE_CX_LEGAL") or os.getenv("GOOGLE_CX"),
+        "comp":  os.getenv("GOOGLE_CX_COMP"),
+    }
+    cx = cx_map.get(engine)
+    if not api_key or not cx:
+        raise SearchConfigError(f"Google API Key o CX no configurados (engine='{engine}')")
+    return api_key, cx
+
+def _results(data: Dict[str, Any], num: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "title": it.get("title"),
+            "link": it.get("link"),
+            "snippet": it.get("snippet"),
+            "displayLink": it.get("displayLink"),
+        }
+        for it in data.get("items", [])[:num]
+    ]
+
+def _pages(start: int, total: int) -> List[Tuple[int, int]]:
+    # (start, num) de cada página para cubrir `total` resultados desde `start` (base 1)
+    end = min(start + total, MAX_RESULTS + 1)
+    return [(s, min(PAGE_SIZE, end - s)) for s in range(start, end, PAGE_SIZE)]
+
+def _merge(pages: List[List[Dict[str, Any]]], total: int) -> List[Dict[str, Any]]:
+    # Concatena en orden de ranking sin repetir enlaces (Google a veces repite entre páginas)
+    seen = set()
+    out = []
+    for page in pages:
+        for it in page:
+            if it.get("link") in seen:
+                continue
+            seen.add(it.get("link"))
+            out.append(it)
+    return out[:total]
+
+def _normalize(q: str) -> str:
+    # Google no distingue mayúsculas ni espacios repetidos
+    return " ".join(q.split()).casefold()
+
+class TTLCache:
+    """
+    Caché LRU acotada con vencimiento por entrada (las vencidas quedan
+    disponibles vía get_stale). Sólo se usa desde el event
+    loop, así que no necesita lock.
+    """
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return None
+
+    def get_stale(self, key):
+        # Las entradas vencidas se conservan (hasta que el LRU las desaloje) para
+        # poder servirlas cuando no queda cuota
+        entry = self._data.get(key)
+        return entry[1] if entry is not None else None
+
+    def put(self, key, value):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+class GoogleSearch:
+    """
+    Cliente de Custom Search con un httpx.AsyncClient compartido durante la vida
+    de la app: conexiones keep-alive (y HTTP/2 si está disponible), así cada
+    búsqueda cuesta un solo round trip en vez de conexión + TLS + consulta.
+    Los resultados se guardan en una caché TTL + LRU por (motor, q normalizada, num)
+    y las consultas idénticas simultáneas comparten una sola llamada a Google.
+    Cada llamada pasa por el limitador del motor y el presupuesto diario; sin
+    cuota se sirve lo que haya en caché aunque esté vencido.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self.cache = TTLCache(GOOGLE_CACHE_TTL, GOOGLE_CACHE_SIZE)
+        # Llamadas en curso por clave de caché (single-flight)
+        self._inflight: Dict[Any, "asyncio.Task"] = {}
+        self.shared = 0
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.budget = DailyBudget(GOOGLE_DAILY_BUDGET)
+        self.stale = 0
+        self.rejected = 0
+
+    async def open(self):
+        http2 = GOOGLE_HTTP2 and _http2_available()
+        if GOOGLE_HTTP2 and not http2:
+            print("[google] h2 no instalado: se usa HTTP/1.1 (pip install 'httpx[http2]')")
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(GOOGLE_READ_TIMEOUT, connect=GOOGLE_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=GOOGLE_MAX_CONNECTIONS,
+                max_keepalive_connections=GOOGLE_MAX_CONNECTIONS,
+                keepalive_expiry=GOOGLE_KEEPALIVE,
+            ),
+        )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def search(
+        self, q: str, num: int = 5, engine: str = "legal", start: int = 1, pages: int = 1,
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Devuelve `num * pages` resultados desde la posición `start` (base 1), junto
+        con su origen: "HIT" si vinieron de la caché, "SHARED" si se sumaron a
+        llamadas idénticas en curso, "MISS" si hubo que consultar a Google y
+        "STALE" si alguna página salió vencida de la caché por falta de cuota.
+        Las páginas de 10 se piden en paralelo, hasta GOOGLE_FANOUT a la vez por
+        búsqueda (el pool de conexiones sigue disponible para las demás).
+        """
+        api_key, cx = _credentials(engine)
+        total = num * pages
+        fanout = asyncio.Semaphore(GOOGLE_FANOUT)
+
+        async def page(s: int, n: int):
+            async with fanout:
+                return await self._page(engine, q, api_key, cx, s, n)
+
+        fetched = await asyncio.gather(*[page(s, n) for s, n in _pages(start, total)])
+        statuses = {status for _, status in fetched}
+        status = next(s for s in ("STALE", "MISS", "SHARED", "HIT") if s in statuses)
+        return _merge([results for results, _ in fetched], total), status
+
+    async def _page(self, engine: str, q: str, api_key: str, cx: str, start: int, num: int):
+        key = (engine, _normalize(q), num, start)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached, "HIT"
+        task = self._inflight.get(key)
+        status = "SHARED"
+        if task is None:
+            params = {"q": q, "key": api_key, "cx": cx, "num": num, "hl": "es", "safe": "active"}
+            if start > 1:
+                params["start"] = start
+            # Tarea propia: si el cliente que la inició se desconecta, el resto sigue esperando
+            task = asyncio.ensure_future(self._fetch(key, engine, params, num))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+            status = "MISS"
+        else:
+            self.shared += 1
+        # El resultado o el error llega igual a todos los que esperan
+        try:
+            return await asyncio.shield(task), status
+        except RateLimited:
+            stale = self.cache.get_stale(key)
+            if stale is None:
+                raise
+            self.stale += 1
+            return stale, "STALE"
+
+    def _done(self, key, task: "asyncio.Task"):
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # marcarla como vista aunque nadie haya quedado esperando
+
+    async def _acquire(self, engine: str):
+        if self.budget.remaining() == 0:
+            self.rejected += 1
+            raise RateLimited("Presupuesto diario de Google agotado", self.budget.resets_in())
+        bucket = self._buckets.get(engine)
+        if bucket is None:
+            bucket = self._buckets[engine] = TokenBucket(GOOGLE_RATE_PER_MIN / 60, GOOGLE_RATE_BURST)
+        timeout = GOOGLE_QUEUE_TIMEOUT if GOOGLE_RATE_POLICY == "queue" else 0.0
+        wait = await bucket.acquire(timeout)
+        if wait:
+            self.rejected += 1
+            raise RateLimited(f"Demasiadas consultas a Google (engine='{engine}')", wait)
+        # Puede haberse agotado mientras esperaba en la cola
+        if not self.budget.take():
+            self.rejected += 1
+            raise RateLimited("Presupuesto diario de Google agotado", self.budget.resets_in())
+
+    async def _fetch(self, key, engine: str, params: Dict[str, Any], num: int) -> List[Dict[str, Any]]:
+        await self._acquire(engine)
+        if self._client is None:
+            await self.open()
+        r = await self._client.get(GOOGLE_URL, params=params)
+        if r.status_code == 429:
+            # Cuota agotada del lado de Google
+            retry = r.headers.get("Retry-After", "")
+            raise RateLimited(
+                "Google rechazó la consulta por cuota (429)", float(retry) if retry.isdigit() else 60.0
+            )
+        r.raise_for_status()
+        results = _results(r.json(), num)
+        self.cache.put(key, results)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cache": self.cache.stats(),
+            "shared": self.shared,
+            "inflight": len(self._inflight),
+            "budget": self.budget.stats(),
+            "rejected": self.rejected,
+            "stale": self.stale,
+        }
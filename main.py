@@ -2,23 +2,55 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import httpx
-import os, io, csv
-from fastapi import FastAPI, HTTPException, Query
+import math
+import os
+import inspect
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import Optional, List
 from models import LinkIn, Link, LinkUpdate
 from storage import get_storage
+from pagination import next_cursor
+from export import csv_chunks, json_chunks, ndjson_chunks
+from google_search import GoogleSearch, SearchConfigError, RateLimited
 from datetime import datetime
 from pydantic import BaseModel
 from fastapi.staticfiles import StaticFiles
 
 CORS_ORIGINS_ENV = os.getenv("CORS_ORIGINS", "*")
 
+storage = get_storage()
+google = GoogleSearch()
+
+
+async def _run(method, *args, **kwargs):
+    # Los backends asíncronos se esperan directamente; los síncronos van al threadpool
+    if inspect.iscoroutinefunction(method):
+        return await method(*args, **kwargs)
+    return await run_in_threadpool(method, *args, **kwargs)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El backend asíncrono abre su pool dentro del event loop
+    if hasattr(storage, "open"):
+        await _run(storage.open)
+    # Cliente HTTP compartido para /search_google
+    await google.open()
+    yield
+    await google.close()
+    # Cerrar recursos del backend (p. ej. el pool de Postgres)
+    await _run(storage.close)
+
+
 app = FastAPI(
     title="Links API",
     version="1.2.0",
-    description="API para guardar y consultar enlaces (Neon Postgres & UI)."
+    description="API para guardar y consultar enlaces (Neon Postgres & UI).",
+    lifespan=lifespan,
 )
 
 origins = [o.strip() for o in CORS_ORIGINS_ENV.split(",")] if CORS_ORIGINS_ENV else ["*"]
@@ -30,58 +62,83 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-storage = get_storage()
-
-
 class LinksResponse(BaseModel):
     links: List[Link]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 @app.get("/health")
-def health():
-    return {"status": "ok", "time": datetime.utcnow().isoformat() + "Z"}
+async def health():
+    # En el event loop: las estadísticas de Google (caché, limitador, presupuesto)
+    # sólo se tocan desde ahí
+    out = {"status": "ok", "time": datetime.utcnow().isoformat() + "Z"}
+    # Métricas del backend (p. ej. aciertos de sentencias preparadas en Postgres)
+    if hasattr(storage, "stats"):
+        out["storage"] = storage.stats()
+    out["google"] = google.stats()
+    return out
 
 
 @app.get("/links", response_model=LinksResponse)
-def list_links(limit: int = 100, offset: int = 0, tag: Optional[str] = None, q: Optional[str] = None):
-    items, total = storage.list_links(limit=limit, offset=offset, tag=tag, q=q)
-    return {"links": items, "total": total}
+async def list_links(
+    limit: int = 100,
+    offset: int = 0,
+    tag: Optional[List[str]] = Query(None),
+    tag_mode: str = Query("all", pattern="^(all|any)$"),
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    match: str = Query("fts", pattern="^(fts|substring)$"),
+    sort: str = Query("recent", pattern="^(recent|relevance)$"),
+    fuzzy: bool = False,
+    count: str = Query("exact", pattern="^(exact|window|estimate|none)$"),
+):
+    try:
+        items, total = await _run(
+            storage.list_links,
+            limit=limit, offset=offset, tags=tag, q=q, cursor=cursor, tag_mode=tag_mode,
+            match=match, sort=sort, fuzzy=fuzzy, count=count,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # El cursor sólo es válido para el orden por fecha
+    nc = next_cursor(items, limit) if sort == "recent" and not (fuzzy and q) else None
+    return {"links": items, "total": total, "next_cursor": nc}
 
 
 @app.post("/links", response_model=Link)
-def create_link(payload: LinkIn):
+async def create_link(payload: LinkIn):
     # Convertir a tipos JSON-serializables (AnyHttpUrl -> str)
-    created = storage.create_link(payload.model_dump(mode="json"))
+    created = await _run(storage.create_link, payload.model_dump(mode="json"))
     return created
 
 
 @app.post("/links/bulk", response_model=LinksResponse)
-def create_links_bulk(payload: List[LinkIn]):
-    created = storage.create_links_bulk([p.model_dump(mode="json") for p in payload])
+async def create_links_bulk(payload: List[LinkIn]):
+    created = await _run(storage.create_links_bulk, [p.model_dump(mode="json") for p in payload])
     return {"links": created, "total": len(created)}
 
 
 @app.get("/links/{link_id}", response_model=Link)
-def get_link(link_id: str):
-    found = storage.get_link(link_id)
+async def get_link(link_id: str):
+    found = await _run(storage.get_link, link_id)
     if not found:
         raise HTTPException(status_code=404, detail="Link not found")
     return found
 
 
 @app.put("/links/{link_id}", response_model=Link)
-def update_link(link_id: str, patch: LinkUpdate):
+async def update_link(link_id: str, patch: LinkUpdate):
     # No enviar claves con None para no sobreescribir en DB
-    updated = storage.update_link(link_id, patch.model_dump(mode="json", exclude_none=True))
+    updated = await _run(storage.update_link, link_id, patch.model_dump(mode="json", exclude_none=True))
     if not updated:
         raise HTTPException(status_code=404, detail="Link not found")
     return updated
 
 
 @app.delete("/links/{link_id}")
-def delete_link(link_id: str):
-    ok = storage.delete_link(link_id)
+async def delete_link(link_id: str):
+    ok = await _run(storage.delete_link, link_id)
     if not ok:
         raise HTTPException(status_code=404, detail="Link not found")
     return {"deleted": True}
@@ -89,65 +146,52 @@ def delete_link(link_id: str):
 
 @app.get("/export.json")
 def export_all_json():
-    items = storage.export_all()
-    return {"links": items}
+    return StreamingResponse(
+        json_chunks(storage.iter_export()),
+        media_type="application/json",
+        headers={"Content-Disposition": 'attachment; filename="links.json"'},
+    )
+
 
+@app.get("/export.ndjson")
+def export_all_ndjson():
+    return StreamingResponse(
+        ndjson_chunks(storage.iter_export()),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="links.ndjson"'},
+    )
 
-@app.get("/export.csv", response_class=PlainTextResponse)
+
+@app.get("/export.csv")
 def export_all_csv():
-    items = storage.export_all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["id", "url", "title", "tags", "notes", "created_at", "updated_at"])
-    for i in items:
-        tags = ",".join(i.get("tags", []))
-        writer.writerow([
-            i.get("id", ""),
-            i.get("url", ""),
-            i.get("title", ""),
-            tags,
-            i.get("notes", ""),
-            i.get("created_at", ""),
-            i.get("updated_at", "")
-        ])
-    return output.getvalue()
+    # Se envía por lotes a medida que se leen, sin cargar toda la tabla en memoria
+    return StreamingResponse(
+        csv_chunks(storage.iter_export()),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="links.csv"'},
+    )
 
 @app.get("/search_google")
-def search_google(
+async def search_google(
+    response: Response,
     q: str,
-    num: int = 5,
-    engine: str = Query("legal", pattern="^(legal|comp)$")
+    num: int = Query(5, ge=1, le=100),
+    engine: str = Query("legal", pattern="^(legal|comp)$"),
+    start: int = Query(1, ge=1, le=100),
+    pages: int = Query(1, ge=1, le=10),
 ):
-    api_key = os.getenv("GOOGLE_API_KEY")
-    cx_map = {
-        "legal": os.getenv("GOOGLE_CX_LEGAL") or os.getenv("GOOGLE_CX"),
-        "comp":  os.getenv("GOOGLE_CX_COMP"),
-    }
-    cx = cx_map.get(engine)
-
-    if not api_key or not cx:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Google API Key o CX no configurados (engine='{engine}')"
-        )
-
-    url = "https://www.googleapis.com/customsearch/v1"
-    params = {"q": q, "key": api_key, "cx": cx, "num": num, "hl": "es", "safe": "active"}
-
+    # num * pages resultados desde `start`; la API los entrega de a 10 (hasta el 100)
     try:
-        r = httpx.get(url, params=params, timeout=20)
-        r.raise_for_status()
-        data = r.json()
-        results = [
-            {
-                "title": it.get("title"),
-                "link": it.get("link"),
-                "snippet": it.get("snippet"),
-                "displayLink": it.get("displayLink"),
-            }
-            for it in data.get("items", [])[:num]
-        ]
+        results, status = await google.search(q, num=num, engine=engine, start=start, pages=pages)
+        response.headers["X-Cache"] = status
         return {"query": q, "results": results}
+    except SearchConfigError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    except RateLimited as e:
+        # Sin cuota y sin resultados en caché (ni siquiera vencidos)
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
     except httpx.HTTPError as e:
         raise HTTPException(status_code=502, detail=f"Error consultando Google: {e}")
 
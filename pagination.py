@@ -0,0 +1,36 @@
+import base64, json
+from datetime import datetime, timezone
+from typing import Any, Optional, Tuple
+
+_EPOCH = datetime.min.replace(tzinfo=timezone.utc)
+
+def to_datetime(v: Any) -> datetime:
+    """Normaliza updated_at/created_at (datetime o texto ISO) a datetime con zona."""
+    if isinstance(v, datetime):
+        dt = v
+    elif v:
+        dt = datetime.fromisoformat(str(v).replace("Z", "+00:00"))
+    else:
+        return _EPOCH
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+def encode_cursor(updated_at: Any, link_id: str) -> str:
+    """Cursor opaco con la última posición (updated_at, id) de la página."""
+    raw = json.dumps([to_datetime(updated_at).isoformat(), str(link_id)])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverso de encode_cursor. Lanza ValueError si el cursor no es válido."""
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        ts, link_id = json.loads(base64.urlsafe_b64decode(cursor + pad))
+        return to_datetime(ts), str(link_id)
+    except Exception as e:
+        raise ValueError(f"cursor inválido: {cursor!r}") from e
+
+def next_cursor(items, limit: int) -> Optional[str]:
+    """Cursor de la página siguiente, o None si ésta es la última."""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(last.get("updated_at"), last.get("id"))
@@ -0,0 +1,196 @@
+from bisect import bisect_left
+from typing import Any, Iterator, List, Tuple
+
+# Estructuras con copia por bloques para los snapshots de JsonStorage: `copy()`
+# cuesta O(bloques) y cada escritura duplica sólo el bloque que toca, así que
+# publicar un snapshot nuevo no copia todo el dataset. Una vez copiada, la
+# instancia original no debe volver a modificarse (queda para los lectores).
+
+class CowMap:
+    """Diccionario repartido en cubetas por hash; crece duplicando las cubetas."""
+
+    __slots__ = ("_buckets", "_mine", "_len")
+
+    LOAD = 64  # entradas promedio por cubeta antes de duplicar
+
+    def __init__(self, items=None):
+        self._buckets: List[dict] = [{}]
+        self._mine: List[bool] = [True]
+        self._len = 0
+        if items:
+            for k, v in items:
+                self[k] = v
+
+    def copy(self) -> "CowMap":
+        new = CowMap.__new__(CowMap)
+        new._buckets = list(self._buckets)
+        new._mine = [False] * len(self._buckets)
+        new._len = self._len
+        # Las cubetas quedan compartidas: ninguna de las dos puede modificarlas en sitio
+        self._mine = [False] * len(self._buckets)
+        return new
+
+    def _bucket(self, key) -> int:
+        return hash(key) & (len(self._buckets) - 1)
+
+    def _own(self, b: int) -> dict:
+        if not self._mine[b]:
+            self._buckets[b] = dict(self._buckets[b])
+            self._mine[b] = True
+        return self._buckets[b]
+
+    def _grow(self):
+        n = len(self._buckets) * 2
+        buckets: List[dict] = [{} for _ in range(n)]
+        for d in self._buckets:
+            for k, v in d.items():
+                buckets[hash(k) & (n - 1)][k] = v
+        self._buckets = buckets
+        self._mine = [True] * n
+
+    def get(self, key, default=None):
+        return self._buckets[self._bucket(key)].get(key, default)
+
+    def __getitem__(self, key):
+        return self._buckets[self._bucket(key)][key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._buckets[self._bucket(key)]
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __bool__(self) -> bool:
+        return self._len > 0
+
+    def __setitem__(self, key, value):
+        d = self._own(self._bucket(key))
+        if key not in d:
+            self._len += 1
+        d[key] = value
+        if self._len > self.LOAD * len(self._buckets):
+            self._grow()
+
+    def pop(self, key, default=None):
+        b = self._bucket(key)
+        if key not in self._buckets[b]:
+            return default
+        self._len -= 1
+        return self._own(b).pop(key)
+
+    def __iter__(self) -> Iterator:
+        for d in self._buckets:
+            yield from d
+
+    def keys(self) -> Iterator:
+        return iter(self)
+
+    def values(self) -> Iterator:
+        for d in self._buckets:
+            yield from d.values()
+
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        for d in self._buckets:
+            yield from d.items()
+
+
+class CowSortedList:
+    """Pares (clave, valor) ordenados por clave, en bloques de ~CHUNK elementos."""
+
+    __slots__ = ("_keys", "_vals", "_maxes", "_mine", "_len")
+
+    CHUNK = 512
+
+    def __init__(self, pairs=None):
+        # `pairs` ya ordenados por clave
+        pairs = list(pairs or [])
+        c = self.CHUNK
+        self._keys = [[k for k, _ in pairs[n:n + c]] for n in range(0, len(pairs), c)]
+        self._vals = [[v for _, v in pairs[n:n + c]] for n in range(0, len(pairs), c)]
+        self._maxes = [ks[-1] for ks in self._keys]
+        self._mine = [True] * len(self._keys)
+        self._len = len(pairs)
+
+    def copy(self) -> "CowSortedList":
+        new = CowSortedList.__new__(CowSortedList)
+        new._keys = list(self._keys)
+        new._vals = list(self._vals)
+        new._maxes = list(self._maxes)
+        new._mine = [False] * len(self._keys)
+        new._len = self._len
+        self._mine = [False] * len(self._keys)
+        return new
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _own(self, c: int):
+        if not self._mine[c]:
+            self._keys[c] = list(self._keys[c])
+            self._vals[c] = list(self._vals[c])
+            self._mine[c] = True
+
+    def add(self, key, value):
+        if not self._keys:
+            self._keys.append([key])
+            self._vals.append([value])
+            self._maxes.append(key)
+            self._mine.append(True)
+            self._len = 1
+            return
+        c = min(bisect_left(self._maxes, key), len(self._keys) - 1)
+        self._own(c)
+        keys, vals = self._keys[c], self._vals[c]
+        pos = bisect_left(keys, key)
+        keys.insert(pos, key)
+        vals.insert(pos, value)
+        self._maxes[c] = keys[-1]
+        self._len += 1
+        if len(keys) > 2 * self.CHUNK:
+            half = len(keys) // 2
+            self._keys[c:c + 1] = [keys[:half], keys[half:]]
+            self._vals[c:c + 1] = [vals[:half], vals[half:]]
+            self._maxes[c:c + 1] = [keys[half - 1], keys[-1]]
+            self._mine[c:c + 1] = [True, True]
+
+    def remove(self, key):
+        c = bisect_left(self._maxes, key)
+        if c == len(self._keys):
+            raise KeyError(key)
+        pos = bisect_left(self._keys[c], key)
+        if self._keys[c][pos] != key:
+            raise KeyError(key)
+        self._own(c)
+        del self._keys[c][pos]
+        del self._vals[c][pos]
+        self._len -= 1
+        if not self._keys[c]:
+            del self._keys[c], self._vals[c], self._maxes[c], self._mine[c]
+        else:
+            self._maxes[c] = self._keys[c][-1]
+
+    def iter_from(self, key) -> Iterator[Tuple[Any, Any]]:
+        """Pares en orden ascendente desde la primera clave >= `key`."""
+        c = bisect_left(self._maxes, key)
+        if c == len(self._keys):
+            return
+        pos = bisect_left(self._keys[c], key)
+        keys, vals = self._keys[c], self._vals[c]
+        for n in range(pos, len(keys)):
+            yield keys[n], vals[n]
+        for c in range(c + 1, len(self._keys)):
+            yield from zip(self._keys[c], self._vals[c])
+
+    def iter_desc(self, before=None) -> Iterator[Tuple[Any, Any]]:
+        """Pares en orden descendente, sólo los de clave menor que `before` si se indica."""
+        c = len(self._keys) - 1
+        if before is not None:
+            c = bisect_left(self._maxes, before)
+            if c < len(self._keys):
+                pos = bisect_left(self._keys[c], before)
+                keys, vals = self._keys[c], self._vals[c]
+                for n in range(pos - 1, -1, -1):
+                    yield keys[n], vals[n]
+            c -= 1
+        for c in range(c, -1, -1):
+            yield from zip(reversed(self._keys[c]), reversed(self._vals[c]))
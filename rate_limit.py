@@ -0,0 +1,92 @@
+import time, asyncio
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+try:
+    from zoneinfo import ZoneInfo
+    # La cuota diaria de las APIs de Google se reinicia a medianoche del Pacífico
+    QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+except Exception:  # sin base de zonas horarias (p. ej. Windows sin tzdata)
+    from datetime import timezone
+    QUOTA_TZ = timezone(timedelta(hours=-8))
+
+class TokenBucket:
+    """
+    Cubeta de fichas: `rate` fichas por segundo hasta `capacity` acumuladas.
+    Pensada para el event loop (sin locks).
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        """Toma una ficha y devuelve 0, o devuelve los segundos hasta que haya una."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self, timeout: float) -> float:
+        """
+        Espera una ficha como máximo `timeout` segundos. Devuelve 0 si la obtuvo
+        o la espera que habría hecho falta si no.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return 0.0
+            if time.monotonic() + wait > deadline:
+                return wait
+            await asyncio.sleep(wait)
+
+class DailyBudget:
+    """Consultas permitidas por día de cuota (`limit` <= 0: sin límite)."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.day = datetime.now(QUOTA_TZ).date()
+
+    def _roll(self):
+        today = datetime.now(QUOTA_TZ).date()
+        if today != self.day:
+            self.day = today
+            self.used = 0
+
+    def remaining(self) -> Optional[int]:
+        self._roll()
+        if self.limit <= 0:
+            return None
+        return max(0, self.limit - self.used)
+
+    def take(self) -> bool:
+        self._roll()
+        if self.limit > 0 and self.used >= self.limit:
+            return False
+        self.used += 1
+        return True
+
+    def resets_in(self) -> float:
+        now = datetime.now(QUOTA_TZ)
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), now.tzinfo)
+        return (midnight - now).total_seconds()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit if self.limit > 0 else None,
+            "used": self.used,
+            "remaining": self.remaining(),
+            "resets_in_s": int(self.resets_in()),
+        }
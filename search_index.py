@@ -0,0 +1,129 @@
+import re, math, unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+from persistent import CowMap, CowSortedList
+
+# Parámetros estándar de BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def fold(text: Optional[str]) -> str:
+    # Minúsculas y sin tildes (NFKD + quitar marcas combinantes): "Resolución" -> "resolucion"
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return re.findall(r"\w+", fold(text))
+
+class InvertedIndex:
+    """
+    Índice invertido token -> {id: (frecuencia, largo)} con ranking BM25.
+
+    Pensado para vivir dentro de un snapshot inmutable: todo está en estructuras
+    con copia por bloques (persistent.py), así que `copy()` cuesta O(bloques) y
+    cada posting se copia (también por cubetas) sólo la primera vez que la copia
+    lo modifica; los lectores del índice anterior no ven cambios. El vocabulario
+    ordenado permite expandir prefijos sin recorrer todos los términos.
+    """
+
+    def __init__(self):
+        # término -> CowMap(id -> (frecuencia, largo del documento))
+        self.postings = CowMap()
+        self.doc_terms = CowMap()  # id -> (términos del documento, cantidad de tokens)
+        self.vocab = CowSortedList()  # términos ordenados (valor sin uso)
+        self.total_len = 0
+        self._owned: set = set()
+
+    def copy(self) -> "InvertedIndex":
+        new = InvertedIndex()
+        new.postings = self.postings.copy()
+        new.doc_terms = self.doc_terms.copy()
+        new.vocab = self.vocab.copy()
+        new.total_len = self.total_len
+        return new
+
+    def _posting(self, term: str) -> CowMap:
+        if term not in self._owned:
+            posting = self.postings.get(term)
+            if posting is None:
+                self.vocab.add(term, None)
+            self.postings[term] = posting.copy() if posting is not None else CowMap()
+            self._owned.add(term)
+        return self.postings[term]
+
+    def add(self, doc_id: str, text: str):
+        if doc_id in self.doc_terms:
+            self.remove(doc_id)
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+        dl = len(tokens)
+        for term, tf in counts.items():
+            self._posting(term)[doc_id] = (tf, dl)
+        self.doc_terms[doc_id] = (tuple(counts), dl)
+        self.total_len += dl
+
+    def remove(self, doc_id: str):
+        entry = self.doc_terms.pop(doc_id, None)
+        if entry is None:
+            return
+        terms, dl = entry
+        for term in terms:
+            posting = self._posting(term)
+            posting.pop(doc_id, None)
+            if not posting:
+                self.postings.pop(term)
+                self.vocab.remove(term)
+                self._owned.discard(term)
+        self.total_len -= dl
+
+    def _expand(self, token: str) -> List[CowMap]:
+        # Postings de los términos que empiezan con `token` (como `palabra:*` en Postgres)
+        out = []
+        for term, _ in self.vocab.iter_from(token):
+            if not term.startswith(token):
+                break
+            out.append(self.postings[term])
+        return out
+
+    def scores(self, query: str, candidates: Iterable[str]) -> Dict[str, float]:
+        """
+        Puntaje BM25 de `query` para cada id de `candidates`, los que ya pasaron el
+        filtro de la búsqueda: el índice ordena, no decide qué coincide. Cada palabra
+        cuenta también como prefijo ("resol" suma las apariciones de "resolucion");
+        los candidatos sin ninguna palabra completa o prefijo quedan con 0.
+        """
+        out = dict.fromkeys(candidates, 0.0)
+        n = len(self.doc_terms)
+        if not out or not n:
+            return out
+        avgdl = (self.total_len / n) or 1.0
+        # BM25 con las constantes fuera del bucle: idf * tf * (k1+1) / (tf + a + b * dl)
+        a = BM25_K1 * (1 - BM25_B)
+        b = BM25_K1 * BM25_B / avgdl
+        for token in dict.fromkeys(tokenize(query)):
+            postings = self._expand(token)
+            if not postings:
+                continue
+            if len(postings) == 1:
+                posting = postings[0]
+            else:
+                # Varias formas del prefijo: frecuencias sumadas por documento
+                posting = {}
+                for p in postings:
+                    for doc, (tf, dl) in p.items():
+                        prev = posting.get(doc)
+                        posting[doc] = (tf, dl) if prev is None else (prev[0] + tf, dl)
+            df = len(posting)
+            w = math.log(1 + (n - df + 0.5) / (df + 0.5)) * (BM25_K1 + 1)
+            if len(out) < df:
+                # Pocos candidatos: se buscan en el posting en vez de recorrerlo
+                for doc in out:
+                    entry = posting.get(doc)
+                    if entry is not None:
+                        tf, dl = entry
+                        out[doc] += w * tf / (tf + a + b * dl)
+            else:
+                for doc, (tf, dl) in posting.items():
+                    if doc in out:
+                        out[doc] += w * tf / (tf + a + b * dl)
+        return out
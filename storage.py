@@ -1,103 +1,470 @@
-import os, json, uuid
+import os, re, json, uuid, time, heapq, queue, threading
+from itertools import islice
+from concurrent.futures import Future
 from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, timezone
+from pagination import decode_cursor, to_datetime
+from search_index import InvertedIndex, fold as _fold
+from persistent import CowMap, CowSortedList
+
+# Group commit: ventana para juntar escrituras concurrentes en una sola (ms) y tope del lote
+JSON_COMMIT_WINDOW_MS = float(os.getenv("JSON_COMMIT_WINDOW_MS", "2"))
+JSON_COMMIT_MAX_BATCH = int(os.getenv("JSON_COMMIT_MAX_BATCH", "1000"))
 
 def now_utc():
     return datetime.now(timezone.utc)
 
+def _order_key(i: Dict[str, Any]):
+    # Orden total estable: (updated_at, id), igual que el índice de Postgres
+    return (to_datetime(i.get("updated_at")), i.get("id", ""))
+
+# Umbral equivalente a pg_trgm.word_similarity_threshold
+FUZZY_THRESHOLD = 0.6
+
+def _trigrams(text: str) -> set:
+    # Mismo esquema que pg_trgm: palabras en minúscula con "  " delante y " " detrás
+    out = set()
+    for w in re.findall(r"\w+", text.lower()):
+        w = f"  {w} "
+        out.update(w[k:k + 3] for k in range(len(w) - 2))
+    return out
+
+def _word_similarity(q_trgm: set, text: str) -> float:
+    # Fracción de trigramas de la consulta presentes en el texto
+    if not q_trgm:
+        return 0.0
+    return len(q_trgm & _trigrams(text)) / len(q_trgm)
+
+_SEARCH_FIELDS = ("title", "url", "notes")
+
+def _search_key(i: Dict[str, Any]) -> Tuple[str, ...]:
+    return tuple(_fold(i.get(f)) for f in _SEARCH_FIELDS)
+
+def _index_text(i: Dict[str, Any]) -> str:
+    return " ".join(i.get(f) or "" for f in _SEARCH_FIELDS)
+
+def _tag_index(items: List[Dict[str, Any]]) -> CowMap:
+    # Índice invertido etiqueta -> ids (CowMap de CowMap usados como conjunto); se arma
+    # una vez por snapshot cargado y después lo mantiene `evolve`
+    index = CowMap()
+    for i in items:
+        for t in i.get("tags") or []:
+            ids = index.get(t)
+            if ids is None:
+                ids = index[t] = CowMap()
+            ids[i["id"]] = True
+    return index
+
+def _tagged_ids(index: CowMap, tags: List[str], tag_mode: str) -> set:
+    postings = [index.get(t) for t in tags]
+    if tag_mode == "any":
+        return {x for p in postings if p for x in p}
+    if not all(postings):
+        return set()
+    # Se recorre la etiqueta con menos enlaces y se comprueba el resto
+    postings.sort(key=len)
+    rest = postings[1:]
+    return {x for x in postings[0] if all(x in p for p in rest)}
+
+def _parse_dates(i: Dict[str, Any]) -> Dict[str, Any]:
+    # En disco las fechas son texto; en memoria, datetime (como las que crea la API)
+    for k in ("created_at", "updated_at"):
+        if k in i:
+            i[k] = to_datetime(i[k])
+    return i
+
+class _Snapshot:
+    """
+    Estado publicado para los lectores. Nunca se modifica: el escritor arma uno
+    nuevo con `evolve` y lo publica de una vez.
+
+    Además del índice por id guarda los registros ordenados por (updated_at, id),
+    el índice etiqueta -> ids, los campos de búsqueda ya normalizados por id y el
+    índice invertido (BM25). Son estructuras con copia por bloques (persistent.py):
+    el snapshot siguiente comparte todo lo que no cambió, así que una escritura
+    cuesta O(cambios + bloques) y no O(n).
+    """
+    __slots__ = ("by_id", "order", "tags", "search", "index", "sig", "_links")
+
+    def __init__(self, by_id, sig, order=None, tags=None, search=None, index=None):
+        if not isinstance(by_id, CowMap):
+            by_id = CowMap(by_id.items())
+        self.by_id = by_id
+        if order is None:
+            items = sorted(by_id.values(), key=_order_key)
+            order = CowSortedList((_order_key(i), i) for i in items)
+            tags = _tag_index(items)
+            search = CowMap((i["id"], _search_key(i)) for i in items)
+            index = InvertedIndex()
+            for i in items:
+                index.add(i["id"], _index_text(i))
+        self.order = order
+        self.tags = tags
+        self.search = search
+        self.index = index
+        self.sig = sig
+        self._links = None
+
+    @property
+    def links(self) -> List[Dict[str, Any]]:
+        # Lista completa (más reciente primero) para exportar o reescribir el archivo;
+        # se arma sólo si alguien la pide
+        if self._links is None:
+            self._links = [i for _, i in self.order.iter_desc()]
+        return self._links
+
+    def evolve(self, by_id: CowMap, puts: Dict[str, Dict[str, Any]], deletes) -> "_Snapshot":
+        # Siguiente snapshot: se ajustan sólo los registros que cambiaron sobre
+        # copias por bloques del estado vigente
+        order = self.order.copy()
+        tags = self.tags.copy()
+        search = self.search.copy()
+        index = self.index.copy()
+        touched: set = set()
+
+        def postings(t):
+            if t not in touched:
+                p = tags.get(t)
+                tags[t] = p.copy() if p is not None else CowMap()
+                touched.add(t)
+            return tags[t]
+
+        def remove(i):
+            order.remove(_order_key(i))
+            for t in i.get("tags") or []:
+                postings(t).pop(i["id"])
+            search.pop(i["id"])
+            index.remove(i["id"])
+
+        def add(i):
+            order.add(_order_key(i), i)
+            for t in i.get("tags") or []:
+                postings(t)[i["id"]] = True
+            search[i["id"]] = _search_key(i)
+            index.add(i["id"], _index_text(i))
+
+        for link_id, i in puts.items():
+            old = self.by_id.get(link_id)
+            if old is not None:
+                remove(old)
+            add(i)
+        for link_id in deletes:
+            old = self.by_id.get(link_id)
+            if old is not None:
+                remove(old)
+        for t in touched:
+            if not tags[t]:
+                tags.pop(t)
+        return _Snapshot(by_id, None, order, tags, search, index)
+
 class JsonStorage:
     def __init__(self, path: str):
         self.path = path
-        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._init_files()
+        # Snapshot vigente (registros parseados + índice id -> registro) y la firma
+        # (mtime, tamaño) del archivo del que salió
+        self._snap: Optional[_Snapshot] = None
+        # Serializa recargas desde disco y la publicación de snapshots del escritor;
+        # los lectores sólo lo toman si el archivo cambió por fuera
+        self._state_lock = threading.RLock()
+        # Un único hilo escritor aplica y persiste las mutaciones por lotes
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, name="json-writer", daemon=True)
+        self._writer.start()
+
+    def _init_files(self):
         if not os.path.exists(self.path):
             with open(self.path, "w", encoding="utf-8") as f:
                 json.dump({"links": []}, f)
 
-    def _read(self):
+    def _signature(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self) -> List[Dict[str, Any]]:
         with open(self.path, "r", encoding="utf-8") as f:
-            return json.load(f)
-
-    def _write(self, data):
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False, default=str)
-
-    def list_links(self, limit: int, offset: int, tag: Optional[str], q: Optional[str]):
-        data = self._read()
-        items = data.get("links", [])
-        if tag:
-            items = [i for i in items if tag in (i.get("tags") or [])]
-        if q:
-            ql = q.lower()
+            return json.load(f).get("links", [])
+
+    def _snapshot(self) -> _Snapshot:
+        # Sólo se vuelve a parsear si el archivo cambió por fuera
+        snap = self._snap
+        if snap is None or self._signature() != snap.sig:
+            with self._state_lock:
+                snap = self._snap
+                sig = self._signature()
+                if snap is None or sig != snap.sig:
+                    by_id = {i["id"]: _parse_dates(i) for i in self._load()}
+                    snap = self._snap = _Snapshot(by_id, sig)
+        return snap
+
+    def _write(self, links: List[Dict[str, Any]], path: Optional[str] = None):
+        # Escritura atómica: archivo temporal + fsync + rename (nunca queda a medias)
+        path = path or self.path
+        os.replace(self._write_tmp(links, path), path)
+
+    def _write_tmp(self, links: List[Dict[str, Any]], path: str) -> str:
+        # Contenido completo de `path` en un temporal ya sincronizado; devuelve su ruta
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"links": links}, f, indent=2, ensure_ascii=False, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp
+
+    def _commit(self, snap: _Snapshot, puts: List[Dict[str, Any]], deletes: List[str]):
+        """
+        Persiste el snapshot `snap` (aún sin publicar), que difiere del vigente en
+        `puts`/`deletes`. Aquí se reescribe el archivo completo; los formatos
+        alternativos (p. ej. journal) sólo escriben el delta.
+        """
+        self._write(snap.links)
+
+    def _submit(self, apply):
+        """
+        Encola una mutación para el hilo escritor y espera a que esté persistida.
+        `apply(by_id)` corre en el escritor sobre una copia de trabajo del índice
+        (reemplazando registros, nunca modificándolos) y devuelve
+        (resultado, puts, deletes).
+        """
+        if not self._writer.is_alive():
+            # Sin escritor nadie resolvería el Future
+            raise RuntimeError("JsonStorage: el hilo escritor no está activo")
+        fut: Future = Future()
+        self._queue.put((apply, fut))
+        return fut.result()
+
+    def _writer_loop(self):
+        window = JSON_COMMIT_WINDOW_MS / 1000
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            stop = False
+            deadline = time.monotonic() + window
+            # Juntar lo que llegue dentro de la ventana (o ya esté encolado)
+            while len(batch) < JSON_COMMIT_MAX_BATCH:
+                try:
+                    nxt = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            try:
+                self._apply_batch(batch)
+            except Exception as e:
+                # P. ej. el archivo no se pudo leer: falla el lote, el escritor sigue vivo
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            if stop:
+                return
+
+    def _apply_batch(self, batch):
+        with self._state_lock:
+            # Copia de trabajo: los lectores siguen con el snapshot vigente
+            base = self._snapshot()
+            by_id = base.by_id.copy()
+            puts: Dict[str, Dict[str, Any]] = {}
+            deletes: set = set()
+            done = []
+            for apply, fut in batch:
+                try:
+                    result, p, d = apply(by_id)
+                except Exception as e:
+                    fut.set_exception(e)
+                    continue
+                for i in p:
+                    puts[i["id"]] = i
+                for link_id in d:
+                    puts.pop(link_id, None)
+                    deletes.add(link_id)
+                done.append((fut, result))
+            try:
+                if puts or deletes:
+                    snap = base.evolve(by_id, puts, deletes)
+                    self._commit(snap, list(puts.values()), list(deletes))
+                    # Publicar sólo lo que ya está en disco
+                    snap.sig = self._signature()
+                    self._snap = snap
+            except Exception as e:
+                for fut, _ in done:
+                    fut.set_exception(e)
+                return
+        for fut, result in done:
+            fut.set_result(result)
+
+    def list_links(
+        self,
+        limit: int,
+        offset: int,
+        tags: Optional[List[str]],
+        q: Optional[str],
+        cursor: Optional[str] = None,
+        tag_mode: str = "all",
+        match: str = "substring",
+        sort: str = "recent",
+        fuzzy: bool = False,
+        count: str = "exact",
+    ):
+        # El backend JSON hace búsqueda por subcadena (o aproximada) y orden por fecha,
+        # sin distinguir mayúsculas ni tildes, sobre campos normalizados al escribir.
+        # Con sort=relevance las coincidencias se ordenan por el índice invertido (BM25).
+        # El snapshot ya viene ordenado: sin filtros la página se lee recorriendo desde
+        # el cursor; con etiquetas se parte de sus ids y se eligen los más recientes
+        # con un heap.
+        # Sin `count` el recorrido por `q` se corta al completar la página.
+        snap = self._snapshot()
+        ck = decode_cursor(cursor) if cursor else None
+        want = offset + limit
+        search = snap.search
+        if q and not fuzzy:
+            qf = _fold(q)
             def matches(i):
-                return any([
-                    ql in (i.get("title","") or "").lower(),
-                    ql in (i.get("url","") or "").lower(),
-                    ql in (i.get("notes","") or "").lower(),
-                ])
-            items = [i for i in items if matches(i)]
-        items.sort(key=lambda x: x.get("updated_at",""), reverse=True)
-        total = len(items)
-        return items[offset:offset+limit], total
+                return any(qf in f for f in search[i["id"]])
+
+        if tags:
+            ids = _tagged_ids(snap.tags, tags, tag_mode)
+            items = [snap.by_id[x] for x in ids]
+        elif q and fuzzy:
+            items = snap.links
+        else:
+            items = None
+
+        if q and not fuzzy and sort == "relevance":
+            # Mismas coincidencias que sort=recent; el índice BM25 sólo las ordena.
+            # El top-k compara tuplas (puntaje, clave de orden) sin funciones de clave
+            # y desempata por fecha (la clave incluye el id: nunca llega a comparar `i`)
+            if items is None:
+                found = [(k, i) for k, i in snap.order.iter_desc() if matches(i)]
+            else:
+                found = [(_order_key(i), i) for i in items if matches(i)]
+            scores = snap.index.scores(q, [i["id"] for _, i in found])
+            top = heapq.nlargest(want, ((scores[i["id"]], k, i) for k, i in found))
+            return [i for _, _, i in top[offset:]], len(found)
+
+        if q and fuzzy:
+            q_trgm = _trigrams(_fold(q))
+            scored = []
+            for i in items:
+                score = max(_word_similarity(q_trgm, f) for f in search[i["id"]])
+                if score >= FUZZY_THRESHOLD:
+                    scored.append((score, _order_key(i), i))
+            top = heapq.nlargest(want, scored, key=lambda x: (x[0], x[1]))
+            return [i for _, _, i in top[offset:]], len(scored)
+
+        if items is not None:
+            if q:
+                items = [i for i in items if matches(i)]
+            total = len(items)
+            if ck is not None:
+                items = [i for i in items if _order_key(i) < ck]
+            return heapq.nlargest(want, items, key=_order_key)[offset:], total
+
+        order = snap.order
+        if not q:
+            return [i for _, i in islice(order.iter_desc(ck), offset, want)], len(order)
+
+        page: List[Dict[str, Any]] = []
+        seen = 0
+        if count == "none":
+            for _, i in order.iter_desc(ck):
+                if matches(i):
+                    if seen >= offset:
+                        page.append(i)
+                        if len(page) == limit:
+                            break
+                    seen += 1
+            return page, None
+        total = 0
+        for k, i in order.iter_desc():
+            if matches(i):
+                total += 1
+                if (ck is None or k < ck) and len(page) < limit:
+                    if seen >= offset:
+                        page.append(i)
+                    seen += 1
+        return page, total
 
     def create_link(self, item: Dict[str, Any]):
-        data = self._read()
-        item["id"] = str(uuid.uuid4())
-        now = now_utc()
-        item["created_at"] = now
-        item["updated_at"] = now
-        data["links"].append(item)
-        self._write(data)
-        return item
+        return self.create_links_bulk([item])[0]
 
     def create_links_bulk(self, items: List[Dict[str, Any]]):
-        data = self._read()
-        now = now_utc()
-        out = []
-        for it in items:
-            rec = dict(it)
-            rec["id"] = str(uuid.uuid4())
-            rec["created_at"] = now
-            rec["updated_at"] = now
-            data["links"].append(rec)
-            out.append(rec)
-        self._write(data)
-        return out
+        def apply(by_id):
+            now = now_utc()
+            out = []
+            for it in items:
+                rec = dict(it)
+                rec["id"] = str(uuid.uuid4())
+                rec["created_at"] = now
+                rec["updated_at"] = now
+                by_id[rec["id"]] = rec
+                out.append(rec)
+            return out, out, []
+        return self._submit(apply)
 
     def get_link(self, link_id: str):
-        data = self._read()
-        for i in data.get("links", []):
-            if i["id"] == link_id:
-                return i
-        return None
+        return self._snapshot().by_id.get(link_id)
 
     def update_link(self, link_id: str, patch: Dict[str, Any]):
-        data = self._read()
-        for i in data.get("links", []):
-            if i["id"] == link_id:
-                i.update({k:v for k,v in patch.items() if v is not None})
-                i["updated_at"] = now_utc()
-                self._write(data)
-                return i
-        return None
+        def apply(by_id):
+            old = by_id.get(link_id)
+            if old is None:
+                return None, [], []
+            # Registro nuevo: el anterior puede estar en uso por un lector
+            i = {**old, **{k:v for k,v in patch.items() if v is not None}}
+            i["updated_at"] = now_utc()
+            by_id[link_id] = i
+            return i, [i], []
+        return self._submit(apply)
 
     def delete_link(self, link_id: str):
-        data = self._read()
-        before = len(data.get("links", []))
-        data["links"] = [i for i in data.get("links", []) if i["id"] != link_id]
-        after = len(data["links"])
-        self._write(data)
-        return after < before
+        def apply(by_id):
+            if by_id.pop(link_id, None) is None:
+                return False, [], []
+            return True, [], [link_id]
+        return self._submit(apply)
 
     def export_all(self):
-        data = self._read()
-        return data.get("links", [])
+        return self._snapshot().links
+
+    def iter_export(self, batch_size: int = 1000):
+        items = self.export_all()
+        for k in range(0, len(items), batch_size):
+            yield items[k:k + batch_size]
+
+    def close(self):
+        # Termina de aplicar lo encolado y detiene el escritor
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
 
 def get_storage():
     if os.getenv("DATABASE_URL"):
+        if os.getenv("PG_ASYNC", "").lower() in ("1", "true", "yes"):
+            print("[storage] Usando Postgres asíncrono (DATABASE_URL + PG_ASYNC)")
+            from storage_pg import AsyncPgStorage
+            return AsyncPgStorage()
         print("[storage] Usando Postgres (DATABASE_URL detectada)")
         from storage_pg import PgStorage
         return PgStorage()
-    print("[storage] Usando JSON local (sin DATABASE_URL)")
+    sqlite_path = os.getenv("SQLITE_PATH")
+    if sqlite_path:
+        print("[storage] Usando SQLite local (SQLITE_PATH)")
+        from storage_sqlite import SqliteStorage
+        return SqliteStorage(sqlite_path)
     path = os.getenv("DATA_FILE", "./data/links.json")
+    if os.path.isdir(path) or path.endswith(("/", os.sep)):
+        print("[storage] Usando JSON particionado local (DATA_FILE=directorio)")
+        from storage_sharded import ShardedJsonStorage
+        return ShardedJsonStorage(path)
+    if path.endswith(".jsonl"):
+        print("[storage] Usando journal JSONL local (DATA_FILE=*.jsonl)")
+        from storage_journal import JournalStorage
+        return JournalStorage(path)
+    print("[storage] Usando JSON local (sin DATABASE_URL)")
     return JsonStorage(path)
 
@@ -0,0 +1,164 @@
+import os, json, threading
+from typing import List, Dict, Any, Optional
+from storage import JsonStorage
+
+# Operaciones acumuladas en el journal antes de compactar en un snapshot
+JOURNAL_COMPACT_EVERY = int(os.getenv("JOURNAL_COMPACT_EVERY", "1000"))
+
+def _stat(path: str):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+def _fsync_dir(path: str):
+    # Hace durable el rename en el directorio (no disponible en Windows)
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(os.path.dirname(path) or ".", os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+class JournalStorage(JsonStorage):
+    """
+    Variante de JsonStorage con log de operaciones (JSONL) + snapshot periódico.
+
+    - `path` (*.jsonl) recibe una línea por cambio: {"op": "put", "link": {...}}
+      o {"op": "del", "id": "..."}; escribir es un append + fsync, O(1).
+    - `<path sin .jsonl>.snapshot.json` guarda el estado completo ({"links": [...]}).
+    - La recuperación carga el snapshot y re-aplica el journal; las operaciones
+      son idempotentes, así que re-aplicar algo ya incluido en el snapshot no
+      cambia el resultado. Una última línea truncada (caída a mitad de append)
+      se descarta y se corta del archivo antes del próximo append.
+    - La compactación corre en un hilo: escribe el snapshot y deja en el journal
+      sólo lo agregado mientras tanto.
+    """
+
+    def __init__(self, path: str):
+        self.snapshot_path = path[: -len(".jsonl")] + ".snapshot.json"
+        self._lock = threading.Lock()
+        self._ops = 0
+        self._compacting: Optional[threading.Thread] = None
+        super().__init__(path)
+
+    def _init_files(self):
+        if not os.path.exists(self.path):
+            open(self.path, "a", encoding="utf-8").close()
+
+    def _signature(self):
+        return (_stat(self.path), _stat(self.snapshot_path))
+
+    def _load(self) -> List[Dict[str, Any]]:
+        by_id: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                for i in json.load(f).get("links", []):
+                    by_id[i["id"]] = i
+        ops = 0
+        with open(self.path, "rb") as f:
+            data = f.read()
+        pos = 0
+        while pos < len(data):
+            end = data.find(b"\n", pos)
+            line = data[pos:] if end < 0 else data[pos:end]
+            nxt = len(data) if end < 0 else end + 1
+            if not line.strip():
+                pos = nxt
+                continue
+            try:
+                op = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                if data[nxt:].strip():
+                    raise
+                # Caída a mitad de append: se corta el journal al final de la última
+                # línea completa para que el próximo append no quede pegado a los restos
+                print(f"[storage] Journal: se descarta la última línea incompleta de {self.path}")
+                self._truncate(pos)
+                break
+            if end < 0:
+                # Línea completa a la que le faltó el salto final
+                self._append_newline()
+            if op.get("op") == "put":
+                by_id[op["link"]["id"]] = op["link"]
+            elif op.get("op") == "del":
+                by_id.pop(op["id"], None)
+            ops += 1
+            pos = nxt
+        self._ops = ops
+        return list(by_id.values())
+
+    def _truncate(self, size: int):
+        with self._lock:
+            with open(self.path, "r+b") as f:
+                f.truncate(size)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _append_newline(self):
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.write(b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _commit(self, snap, puts: List[Dict[str, Any]], deletes: List[str]):
+        lines = [{"op": "put", "link": i} for i in puts] + [{"op": "del", "id": d} for d in deletes]
+        payload = "".join(
+            json.dumps(op, ensure_ascii=False, default=str) + "\n" for op in lines
+        )
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            self._ops += len(lines)
+            if self._ops >= JOURNAL_COMPACT_EVERY and self._compacting is None:
+                # Estado (inmutable) y posición del journal que cubrirá el snapshot
+                links = snap.links
+                offset = os.path.getsize(self.path)
+                self._compacting = threading.Thread(
+                    target=self._compact, args=(links, offset), name="journal-compact", daemon=True
+                )
+                self._compacting.start()
+
+    def _compact(self, links: List[Dict[str, Any]], offset: int):
+        try:
+            tmp = self.snapshot_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"links": links}, f, ensure_ascii=False, default=str)
+                f.flush()
+                os.fsync(f.fileno())
+            # Publicar snapshot y journal recortado bajo el lock de estado (mismo orden
+            # que el escritor: estado -> journal). Un lector que vea la firma cambiada
+            # espera aquí y, al re-chequear, encuentra la firma ya actualizada en vez
+            # de recargar todo. Si hay una caída entre los dos replace, el journal
+            # completo se re-aplica sobre el snapshot nuevo sin efecto (idempotente).
+            with self._state_lock, self._lock:
+                os.replace(tmp, self.snapshot_path)
+                _fsync_dir(self.snapshot_path)
+                with open(self.path, "rb") as f:
+                    f.seek(offset)
+                    tail = f.read()
+                tmp = self.path + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.path)
+                _fsync_dir(self.path)
+                self._ops = tail.count(b"\n")
+                # Mismo contenido en archivos nuevos: actualizar la firma del estado vigente
+                if self._snap is not None:
+                    self._snap.sig = self._signature()
+        except Exception as e:
+            print(f"[storage] Journal: falló la compactación: {e}")
+        finally:
+            self._compacting = None
+
+    def close(self):
+        super().close()
+        t = self._compacting
+        if t is not None:
+            t.join()
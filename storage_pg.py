@@ -1,169 +1,558 @@
 import os
-import psycopg
-from typing import List, Optional, Dict, Any, Tuple
+import re
+import uuid
+import threading
+import weakref
+from psycopg_pool import ConnectionPool, AsyncConnectionPool
+from typing import List, Optional, Dict, Any, Tuple, Iterator, AsyncIterator
 from datetime import datetime, timezone
 from psycopg.rows import dict_row  # row_factory=dict_row
+from pagination import decode_cursor
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Tamaño y ciclo de vida del pool (segundos para los tiempos)
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "10"))
+PG_POOL_MAX_IDLE = float(os.getenv("PG_POOL_MAX_IDLE", "300"))
+PG_POOL_MAX_LIFETIME = float(os.getenv("PG_POOL_MAX_LIFETIME", "1800"))
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "30"))
+
+# Sentencias preparadas en el servidor para las consultas calientes (0 = desactivar,
+# p. ej. detrás de un pgbouncer en modo transacción sin soporte de prepared statements)
+PG_PREPARE = os.getenv("PG_PREPARE", "1").lower() not in ("0", "false", "no")
+PG_PREPARED_MAX = int(os.getenv("PG_PREPARED_MAX", "256"))
+
+# A partir de este tamaño el bulk usa COPY; por debajo, un único INSERT multi-fila
+PG_BULK_COPY_MIN = int(os.getenv("PG_BULK_COPY_MIN", "500"))
+
+# Filas por lote al exportar desde el cursor del servidor
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+_BULK_COLUMNS = ("id", "url", "title", "tags", "notes", "created_at", "updated_at")
+_BULK_TYPES = ["uuid", "text", "text", "text[]", "text", "timestamptz", "timestamptz"]
+
+_COLUMNS = "id::text as id, url, title, tags, notes, created_at, updated_at"
+_SELECT = f"select {_COLUMNS} from links"
+_RETURNING = f"returning {_COLUMNS}"
+
+# Configuración de texto completo (español + unaccent), creada en el arranque
+FTS_CONFIG = "es_unaccent"
+
 def now_utc():
     return datetime.now(timezone.utc)
 
-def _connect(**kw):
+class _PreparedStats:
+    """
+    Cuenta aciertos del caché de sentencias preparadas: cada conexión del pool
+    prepara una vez cada texto SQL del catálogo y luego sólo ejecuta (sin parse/plan).
+    """
+
+    def __init__(self):
+        self._seen: "weakref.WeakKeyDictionary[Any, set]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def prepare(self, conn, sql: str) -> bool:
+        """Registra el uso de `sql` en `conn` y devuelve el valor para execute(prepare=...)."""
+        if not PG_PREPARE:
+            return False
+        with self._lock:
+            seen = self._seen.setdefault(conn, set())
+            if sql in seen:
+                self.hits += 1
+            else:
+                seen.add(sql)
+                self.misses += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self.hits + self.misses
+            return {
+                "enabled": PG_PREPARE,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / calls, 4) if calls else None,
+                "statements": sum(len(v) for v in self._seen.values()),
+            }
+
+def _configure(conn) -> None:
+    # El catálogo (incluidas las variantes de list/update) debe caber sin desalojos
+    conn.prepared_max = PG_PREPARED_MAX
+
+async def _aconfigure(conn) -> None:
+    conn.prepared_max = PG_PREPARED_MAX
+
+def _pool_options() -> Dict[str, Any]:
     if not DATABASE_URL:
         raise RuntimeError("DATABASE_URL no configurada")
-    return psycopg.connect(
-        DATABASE_URL,
-        row_factory=dict_row,
-        autocommit=True,
-        connect_timeout=10,
-        **kw
+    return dict(
+        conninfo=DATABASE_URL,
+        min_size=PG_POOL_MIN,
+        max_size=max(PG_POOL_MAX, PG_POOL_MIN),
+        max_idle=PG_POOL_MAX_IDLE,
+        max_lifetime=PG_POOL_MAX_LIFETIME,
+        timeout=PG_POOL_TIMEOUT,
+        kwargs={"row_factory": dict_row, "autocommit": True, "connect_timeout": 10},
+        name="links",
+    )
+
+def _make_pool() -> ConnectionPool:
+    return ConnectionPool(
+        # Verifica la conexión al prestarla (descarta las que el servidor cerró)
+        check=ConnectionPool.check_connection,
+        configure=_configure,
+        open=True,
+        **_pool_options(),
+    )
+
+def _schema_statements() -> List[str]:
+    """DDL idempotente que se ejecuta al arrancar (tabla, extensiones e índices)."""
+    stmts = [
+        "create extension if not exists pgcrypto;",
+        """
+        create table if not exists links(
+          id uuid primary key default gen_random_uuid(),
+          url text not null,
+          title text,
+          tags text[],
+          notes text,
+          created_at timestamptz default now(),
+          updated_at timestamptz default now()
+        );
+        """,
+        # Índice compuesto para el orden del listado y la paginación por cursor
+        "create index if not exists links_updated_at_id_idx on links (updated_at desc, id desc);",
+        # Búsqueda de texto completo: configuración española sin tildes,
+        # columna tsvector generada (se mantiene sola) e índice GIN
+        "create extension if not exists unaccent;",
+        f"""
+        do $$
+        begin
+          if not exists (select 1 from pg_ts_config where cfgname = '{FTS_CONFIG}') then
+            create text search configuration {FTS_CONFIG} (copy = spanish);
+            alter text search configuration {FTS_CONFIG}
+              alter mapping for hword, hword_part, word with unaccent, spanish_stem;
+          end if;
+        end
+        $$;
+        """,
+        f"""
+        alter table links add column if not exists search_tsv tsvector
+        generated always as (
+          setweight(to_tsvector('{FTS_CONFIG}', coalesce(title, '')), 'A') ||
+          setweight(to_tsvector('{FTS_CONFIG}', coalesce(notes, '')), 'B') ||
+          setweight(to_tsvector('simple', coalesce(url, '')), 'C')
+        ) stored;
+        """,
+        "create index if not exists links_search_tsv_idx on links using gin (search_tsv);",
+        # GIN sobre el arreglo de etiquetas para @> / &&
+        "create index if not exists links_tags_idx on links using gin (tags);",
+        # Trigramas para subcadenas (ilike) y búsqueda aproximada de fragmentos de URL
+        "create extension if not exists pg_trgm;",
+    ]
+    for col in ("url", "title", "notes"):
+        stmts.append(
+            f"create index if not exists links_{col}_trgm_idx on links using gin ({col} gin_trgm_ops);"
+        )
+    return stmts
+
+def _prefix_tsquery(q: str) -> Optional[str]:
+    # Cada palabra como prefijo ("resol:*"), unidas con AND, igual que el FTS de SQLite.
+    # Sólo caracteres de palabra: nada de la sintaxis de to_tsquery llega desde q
+    terms = re.findall(r"\w+", q)
+    return " & ".join(f"{t}:*" for t in terms) or None
+
+def _list_queries(
+    limit: int,
+    offset: int,
+    tags: Optional[List[str]],
+    q: Optional[str],
+    cursor: Optional[str],
+    tag_mode: str,
+    match: str,
+    sort: str,
+    fuzzy: bool,
+    count: str,
+) -> Tuple[str, List[Any], str, List[Any], str]:
+    """
+    Arma (count_sql, count_params, page_sql, page_params, total_mode) para list_links.
+    total_mode indica cómo obtener el total: "window" (en la misma consulta de la
+    página), "query" (count aparte), "estimate" (estadísticas del planner) o "none".
+    """
+    where = []
+    params: List[Any] = []
+    order_sql = "updated_at desc, id desc"
+    order_params: List[Any] = []
+
+    if tags:
+        # all: contiene todas (@>); any: comparte alguna (&&). Ambas usan el índice GIN
+        where.append("tags @> %s::text[]" if tag_mode == "all" else "tags && %s::text[]")
+        params.append(list(tags))
+    if q and fuzzy:
+        # word_similarity (<%) usa los índices de trigramas; orden por parecido
+        where.append("(%s <%% title or %s <%% url or %s <%% notes)")
+        params.extend([q, q, q])
+        order_sql = (
+            "greatest(word_similarity(%s, coalesce(title,'')), word_similarity(%s, url), "
+            "word_similarity(%s, coalesce(notes,''))) desc, " + order_sql
+        )
+        order_params.extend([q, q, q])
+    elif q and match == "fts" and _prefix_tsquery(q):
+        # Prefijos sobre título/notas; la URL se indexa como tokens enteros, así que
+        # sus fragmentos ("RESOLUC-256") se buscan por subcadena (índice de trigramas)
+        tsq = _prefix_tsquery(q)
+        where.append(f"(search_tsv @@ to_tsquery('{FTS_CONFIG}', %s) or url ilike %s)")
+        params.extend([tsq, f"%{q}%"])
+        if sort == "relevance":
+            order_sql = (
+                f"ts_rank_cd(search_tsv, to_tsquery('{FTS_CONFIG}', %s)) desc, "
+                + order_sql
+            )
+            order_params.append(tsq)
+    elif q:
+        # Sin coalesce para que ilike pueda usar los índices de trigramas
+        where.append("(title ilike %s or url ilike %s or notes ilike %s)")
+        like = f"%{q}%"
+        params.extend([like, like, like])
+
+    wh = (" where " + " and ".join(where)) if where else ""
+
+    # Keyset: seguir después de la última fila (updated_at, id) de la página anterior.
+    # Sólo aplica al orden por fecha; con relevancia se pagina con offset.
+    page_where = list(where)
+    page_params = list(params)
+    if cursor and not order_params:
+        ts, link_id = decode_cursor(cursor)
+        # Sólo aquí los ids son UUID: un cursor con otro id daría 500 en el cast
+        try:
+            link_id = str(uuid.UUID(link_id))
+        except ValueError:
+            raise ValueError(f"cursor inválido: {cursor!r}") from None
+        page_where.append("(updated_at, id) < (%s, %s::uuid)")
+        page_params.extend((ts, link_id))
+    page_wh = (" where " + " and ".join(page_where)) if page_where else ""
+
+    if count == "none":
+        total_mode = "none"
+    elif count == "estimate" and not where:
+        total_mode = "estimate"
+    elif count == "window" and len(page_where) == len(where):
+        # Opcional: con filtros selectivos ahorra un round trip, pero obliga a leer
+        # todas las filas del filtro antes del LIMIT. Con cursor la ventana sólo
+        # contaría lo que queda, así que ahí se cuenta aparte
+        total_mode = "window"
+    else:
+        # count(*) aparte: barato sin filtros y la página sigue el índice con LIMIT
+        total_mode = "query"
+
+    # count(*) over() calcula el total del filtro en la misma pasada que la página
+    window = ", count(*) over() as _total" if total_mode == "window" else ""
+    page_sql = f"""
+        select {_COLUMNS}{window} from links{page_wh}
+        order by {order_sql}
+        limit %s offset %s
+        """
+    return (
+        f"select count(*) as c from links{wh}",
+        params,
+        page_sql,
+        [*page_params, *order_params, limit, offset],
+        total_mode,
+    )
+
+# Estimación del planner para listados sin filtro (-1 si la tabla nunca se analizó)
+_ESTIMATE_SQL = "select reltuples::bigint as c from pg_class where oid = 'links'::regclass"
+
+def _pop_window_total(rows: List[Dict[str, Any]]) -> Optional[int]:
+    total = None
+    for r in rows:
+        total = r.pop("_total", None)
+    return total
+
+_INSERT_SQL = f"""
+    insert into links(url, title, tags, notes, created_at, updated_at)
+    values (%s, %s, %s, %s, %s, %s)
+    {_RETURNING}
+    """
+
+def _insert_params(item: Dict[str, Any]) -> List[Any]:
+    now = now_utc()
+    url = str(item["url"])  # asegurar string
+    return [url, item.get("title"), item.get("tags") or [], item.get("notes"), now, now]
+
+def _bulk_rows(items: List[Dict[str, Any]]) -> List[Tuple[Any, ...]]:
+    now = now_utc()
+    # Ids generados aquí: COPY no tiene RETURNING y así se evita releer las filas
+    return [
+        (uuid.uuid4(), str(it["url"]), it.get("title"), it.get("tags") or [], it.get("notes"), now, now)
+        for it in items
+    ]
+
+def _bulk_insert_sql(n: int) -> str:
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s)"] * n)
+    return f"insert into links({', '.join(_BULK_COLUMNS)}) values {values}"
+
+_COPY_SQL = f"copy links({', '.join(_BULK_COLUMNS)}) from stdin"
+
+def _bulk_records(rows: List[Tuple[Any, ...]]) -> List[Dict[str, Any]]:
+    return [dict(zip(_BULK_COLUMNS, (str(r[0]), *r[1:]))) for r in rows]
+
+def _update_query(link_id: str, patch: Dict[str, Any]) -> Optional[Tuple[str, List[Any]]]:
+    fields: List[str] = []
+    params: List[Any] = []
+
+    for k in ("url", "title", "tags", "notes"):
+        if patch.get(k) is not None:
+            v = str(patch[k]) if k == "url" else patch[k]
+            fields.append(f"{k}=%s")
+            params.append(v)
+
+    if not fields:
+        return None
+
+    fields_sql = ", ".join(fields + ["updated_at=%s"])
+    params.append(now_utc())
+    params.append(link_id)
+    return (
+        f"""
+        update links
+        set {fields_sql}
+        where id=%s
+        {_RETURNING}
+        """,
+        params,
     )
 
+_GET_SQL = f"{_SELECT} where id = %s"
+_DELETE_SQL = "delete from links where id=%s"
+_EXPORT_SQL = f"{_SELECT} order by updated_at desc, id desc"
+
 class PgStorage:
     def __init__(self):
         if not DATABASE_URL:
             raise RuntimeError("DATABASE_URL no configurada")
 
-        # Crear extensión y tabla si no existen (conexión efímera)
-        with _connect() as conn, conn.cursor() as cur:
-            cur.execute("create extension if not exists pgcrypto;")
-            cur.execute(
-                """
-                create table if not exists links(
-                  id uuid primary key default gen_random_uuid(),
-                  url text not null,
-                  title text,
-                  tags text[],
-                  notes text,
-                  created_at timestamptz default now(),
-                  updated_at timestamptz default now()
-                );
-                """
-            )
+        self._pool = _make_pool()
+        self._prepared = _PreparedStats()
+
+        # Crear extensión y tabla si no existen
+        with self._pool.connection() as conn, conn.cursor() as cur:
+            for stmt in _schema_statements():
+                cur.execute(stmt)
 
     def list_links(
         self,
         limit: int,
         offset: int,
-        tag: Optional[str],
+        tags: Optional[List[str]],
         q: Optional[str],
-    ) -> Tuple[List[Dict[str, Any]], int]:
-        where = []
-        params: List[Any] = []
-
-        if tag:
-            where.append("%s = any(tags)")
-            params.append(tag)
-        if q:
-            where.append(
-                "(coalesce(title,'') ilike %s or url ilike %s or coalesce(notes,'') ilike %s)"
-            )
-            like = f"%{q}%"
-            params.extend([like, like, like])
-
-        wh = (" where " + " and ".join(where)) if where else ""
-
-        with _connect() as conn, conn.cursor() as cur:
-            cur.execute(f"select count(*) as c from links{wh}", params)
-            total = cur.fetchone()["c"]
-
-            cur.execute(
-                f"""
-                select id::text as id, url, title, tags, notes, created_at, updated_at
-                from links{wh}
-                order by updated_at desc
-                limit %s offset %s
-                """,
-                [*params, limit, offset],
-            )
+        cursor: Optional[str] = None,
+        tag_mode: str = "all",
+        match: str = "fts",
+        sort: str = "recent",
+        fuzzy: bool = False,
+        count: str = "exact",
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        count_sql, count_params, page_sql, page_params, total_mode = _list_queries(
+            limit, offset, tags, q, cursor, tag_mode, match, sort, fuzzy, count
+        )
+        with self._pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(page_sql, page_params, prepare=self._prepared.prepare(conn, page_sql))
             rows = cur.fetchall()
+            total = _pop_window_total(rows)
+
+            if total_mode == "estimate":
+                cur.execute(_ESTIMATE_SQL, prepare=self._prepared.prepare(conn, _ESTIMATE_SQL))
+                total = cur.fetchone()["c"]
+                if total < 0:
+                    total_mode = "query"
+            # Página vacía (sin fila que traiga el total) o total pedido aparte
+            if total_mode == "query" or (total_mode == "window" and total is None):
+                cur.execute(count_sql, count_params, prepare=self._prepared.prepare(conn, count_sql))
+                total = cur.fetchone()["c"]
 
         return rows, total
 
     def create_link(self, item: Dict[str, Any]) -> Dict[str, Any]:
-        now = now_utc()
-        tags = item.get("tags") or []
-        url = str(item["url"])  # asegurar string
-        with _connect() as conn, conn.cursor() as cur:
-            cur.execute(
-                """
-                insert into links(url, title, tags, notes, created_at, updated_at)
-                values (%s, %s, %s, %s, %s, %s)
-                returning id::text as id, url, title, tags, notes, created_at, updated_at
-                """,
-                [url, item.get("title"), tags, item.get("notes"), now, now],
-            )
+        with self._pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(_INSERT_SQL, _insert_params(item), prepare=self._prepared.prepare(conn, _INSERT_SQL))
             return cur.fetchone()
 
     def create_links_bulk(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        now = now_utc()
-        out: List[Dict[str, Any]] = []
-        # transacción explícita para bulk
-        with _connect(autocommit=False) as conn, conn.cursor() as cur:
-            try:
-                for it in items:
-                    url = str(it["url"])
-                    cur.execute(
-                        """
-                        insert into links(url, title, tags, notes, created_at, updated_at)
-                        values (%s, %s, %s, %s, %s, %s)
-                        returning id::text as id, url, title, tags, notes, created_at, updated_at
-                        """,
-                        [url, it.get("title"), it.get("tags") or [], it.get("notes"), now, now],
-                    )
-                    out.append(cur.fetchone())
-                conn.commit()
-            except Exception:
-                conn.rollback()
-                raise
-        return out
+        rows = _bulk_rows(items)
+        if not rows:
+            return []
+        # transacción explícita para bulk (rollback automático si falla)
+        with self._pool.connection() as conn, conn.transaction(), conn.cursor() as cur:
+            if len(rows) < PG_BULK_COPY_MIN:
+                cur.execute(_bulk_insert_sql(len(rows)), [v for r in rows for v in r], prepare=False)
+            else:
+                with cur.copy(_COPY_SQL) as copy:
+                    copy.set_types(_BULK_TYPES)
+                    for r in rows:
+                        copy.write_row(r)
+        return _bulk_records(rows)
 
     def get_link(self, link_id: str) -> Optional[Dict[str, Any]]:
-        with _connect() as conn, conn.cursor() as cur:
-            cur.execute(
-                "select id::text as id, url, title, tags, notes, created_at, updated_at from links where id = %s",
-                [link_id],
-            )
+        with self._pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(_GET_SQL, [link_id], prepare=self._prepared.prepare(conn, _GET_SQL))
             return cur.fetchone()
 
     def update_link(self, link_id: str, patch: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        fields: List[str] = []
-        params: List[Any] = []
-
-        for k in ("url", "title", "tags", "notes"):
-            if patch.get(k) is not None:
-                v = str(patch[k]) if k == "url" else patch[k]
-                fields.append(f"{k}=%s")
-                params.append(v)
-
-        if not fields:
+        query = _update_query(link_id, patch)
+        if not query:
             return self.get_link(link_id)
 
-        fields_sql = ", ".join(fields + ["updated_at=%s"])
-        params.append(now_utc())
-        params.append(link_id)
-
-        with _connect() as conn, conn.cursor() as cur:
-            cur.execute(
-                f"""
-                update links
-                set {fields_sql}
-                where id=%s
-                returning id::text as id, url, title, tags, notes, created_at, updated_at
-                """,
-                params,
-            )
+        with self._pool.connection() as conn, conn.cursor() as cur:
+            sql, params = query
+            cur.execute(sql, params, prepare=self._prepared.prepare(conn, sql))
             return cur.fetchone()
 
     def delete_link(self, link_id: str) -> bool:
-        with _connect() as conn, conn.cursor() as cur:
-            cur.execute("delete from links where id=%s", [link_id])
+        with self._pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(_DELETE_SQL, [link_id], prepare=self._prepared.prepare(conn, _DELETE_SQL))
             return cur.rowcount > 0
 
     def export_all(self) -> List[Dict[str, Any]]:
-        with _connect() as conn, conn.cursor() as cur:
-            cur.execute(
-                "select id::text as id, url, title, tags, notes, created_at, updated_at from links order by updated_at desc"
-            )
+        with self._pool.connection() as conn, conn.cursor() as cur:
+            cur.execute(_EXPORT_SQL)
             return cur.fetchall()
+
+    def iter_export(self, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+        # Cursor con nombre (lado servidor): la memoria no depende del tamaño de la tabla
+        with self._pool.connection() as conn, conn.transaction():
+            with conn.cursor(name="links_export") as cur:
+                cur.itersize = batch_size
+                cur.execute(_EXPORT_SQL)
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+
+    def stats(self) -> Dict[str, Any]:
+        return {"prepared": self._prepared.stats()}
+
+    def close(self) -> None:
+        self._pool.close()
+
+class AsyncPgStorage:
+    """
+    Variante asíncrona de PgStorage (mismas consultas) sobre AsyncConnectionPool.
+    El pool se abre en open() dentro del event loop de la app y se cierra con close().
+    """
+
+    def __init__(self):
+        if not DATABASE_URL:
+            raise RuntimeError("DATABASE_URL no configurada")
+
+        self._pool = AsyncConnectionPool(
+            check=AsyncConnectionPool.check_connection,
+            configure=_aconfigure,
+            open=False,
+            **_pool_options(),
+        )
+        self._prepared = _PreparedStats()
+
+    async def open(self) -> None:
+        await self._pool.open()
+        async with self._pool.connection() as conn, conn.cursor() as cur:
+            for stmt in _schema_statements():
+                await cur.execute(stmt)
+
+    async def list_links(
+        self,
+        limit: int,
+        offset: int,
+        tags: Optional[List[str]],
+        q: Optional[str],
+        cursor: Optional[str] = None,
+        tag_mode: str = "all",
+        match: str = "fts",
+        sort: str = "recent",
+        fuzzy: bool = False,
+        count: str = "exact",
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        count_sql, count_params, page_sql, page_params, total_mode = _list_queries(
+            limit, offset, tags, q, cursor, tag_mode, match, sort, fuzzy, count
+        )
+        async with self._pool.connection() as conn, conn.cursor() as cur:
+            await cur.execute(page_sql, page_params, prepare=self._prepared.prepare(conn, page_sql))
+            rows = await cur.fetchall()
+            total = _pop_window_total(rows)
+
+            if total_mode == "estimate":
+                await cur.execute(_ESTIMATE_SQL, prepare=self._prepared.prepare(conn, _ESTIMATE_SQL))
+                total = (await cur.fetchone())["c"]
+                if total < 0:
+                    total_mode = "query"
+            if total_mode == "query" or (total_mode == "window" and total is None):
+                await cur.execute(count_sql, count_params, prepare=self._prepared.prepare(conn, count_sql))
+                total = (await cur.fetchone())["c"]
+
+        return rows, total
+
+    async def create_link(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        async with self._pool.connection() as conn, conn.cursor() as cur:
+            await cur.execute(_INSERT_SQL, _insert_params(item), prepare=self._prepared.prepare(conn, _INSERT_SQL))
+            return await cur.fetchone()
+
+    async def create_links_bulk(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        rows = _bulk_rows(items)
+        if not rows:
+            return []
+        async with self._pool.connection() as conn, conn.transaction(), conn.cursor() as cur:
+            if len(rows) < PG_BULK_COPY_MIN:
+                await cur.execute(_bulk_insert_sql(len(rows)), [v for r in rows for v in r], prepare=False)
+            else:
+                async with cur.copy(_COPY_SQL) as copy:
+                    copy.set_types(_BULK_TYPES)
+                    for r in rows:
+                        await copy.write_row(r)
+        return _bulk_records(rows)
+
+    async def get_link(self, link_id: str) -> Optional[Dict[str, Any]]:
+        async with self._pool.connection() as conn, conn.cursor() as cur:
+            await cur.execute(_GET_SQL, [link_id], prepare=self._prepared.prepare(conn, _GET_SQL))
+            return await cur.fetchone()
+
+    async def update_link(self, link_id: str, patch: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        query = _update_query(link_id, patch)
+        if not query:
+            return await self.get_link(link_id)
+
+        async with self._pool.connection() as conn, conn.cursor() as cur:
+            sql, params = query
+            await cur.execute(sql, params, prepare=self._prepared.prepare(conn, sql))
+            return await cur.fetchone()
+
+    async def delete_link(self, link_id: str) -> bool:
+        async with self._pool.connection() as conn, conn.cursor() as cur:
+            await cur.execute(_DELETE_SQL, [link_id], prepare=self._prepared.prepare(conn, _DELETE_SQL))
+            return cur.rowcount > 0
+
+    async def export_all(self) -> List[Dict[str, Any]]:
+        async with self._pool.connection() as conn, conn.cursor() as cur:
+            await cur.execute(_EXPORT_SQL)
+            return await cur.fetchall()
+
+    async def iter_export(self, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[List[Dict[str, Any]]]:
+        # Igual que PgStorage.iter_export, con cursor de servidor asíncrono
+        async with self._pool.connection() as conn, conn.transaction():
+            async with conn.cursor(name="links_export") as cur:
+                cur.itersize = batch_size
+                await cur.execute(_EXPORT_SQL)
+                while True:
+                    rows = await cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield rows
+
+    def stats(self) -> Dict[str, Any]:
+        return {"prepared": self._prepared.stats()}
+
+    async def close(self) -> None:
+        await self._pool.close()
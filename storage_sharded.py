@@ -0,0 +1,118 @@
+import os, json, zlib
+from typing import List, Dict, Any, Optional
+from storage import JsonStorage
+
+# Cantidad de particiones para directorios nuevos (los existentes usan la del manifest)
+DATA_SHARDS = int(os.getenv("DATA_SHARDS", "16"))
+
+def _stat(path: str):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+def _shard_of(link_id: str, shards: int) -> int:
+    # Hash estable entre procesos (hash() de Python cambia con cada arranque)
+    return zlib.crc32(link_id.encode("utf-8")) % shards
+
+class ShardedJsonStorage(JsonStorage):
+    """
+    Variante de JsonStorage para datasets grandes: `path` es un directorio con
+    `manifest.json` ({"version": 1, "shards": N, "hash": "crc32"}) y N archivos
+    `shard-XX.json`, cada uno con la forma clásica {"links": [...]}.
+
+    - Cada id va siempre a la misma partición (crc32(id) % N).
+    - Una escritura reescribe sólo las particiones que tocan sus cambios.
+    - Si el directorio cambia por fuera, se vuelven a leer sólo las particiones
+      cuya firma (mtime, tamaño) cambió.
+    """
+
+    def __init__(self, path: str, shards: int = DATA_SHARDS):
+        path = path.rstrip("/" + os.sep) or path
+        self.manifest_path = os.path.join(path, "manifest.json")
+        self.shards = shards
+        # Registros por partición y la firma con la que se leyeron (protegido por _state_lock)
+        self._shard_links: List[Dict[str, Dict[str, Any]]] = []
+        self._shard_sigs: List[Optional[tuple]] = []
+        super().__init__(path)
+
+    def _init_files(self):
+        os.makedirs(self.path, exist_ok=True)
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.shards = int(json.load(f)["shards"])
+        else:
+            tmp = self.manifest_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "shards": self.shards, "hash": "crc32"}, f)
+            os.replace(tmp, self.manifest_path)
+        self._shard_links = [{} for _ in range(self.shards)]
+        self._shard_sigs = [False] * self.shards
+
+    def _shard_path(self, k: int) -> str:
+        return os.path.join(self.path, f"shard-{k:02d}.json")
+
+    def _signature(self):
+        return tuple(_stat(self._shard_path(k)) for k in range(self.shards))
+
+    def _load(self) -> List[Dict[str, Any]]:
+        for k in range(self.shards):
+            path = self._shard_path(k)
+            sig = _stat(path)
+            if sig == self._shard_sigs[k]:
+                continue
+            links: Dict[str, Dict[str, Any]] = {}
+            if sig is not None:
+                with open(path, "r", encoding="utf-8") as f:
+                    for i in json.load(f).get("links", []):
+                        links[i["id"]] = i
+            self._shard_links[k] = links
+            self._shard_sigs[k] = sig
+        return [i for shard in self._shard_links for i in shard.values()]
+
+    def _commit(self, snap, puts: List[Dict[str, Any]], deletes: List[str]):
+        """
+        Un lote que toca varias particiones se escribe en dos fases: primero todos
+        los temporales y sólo si todos salieron bien, los rename. Si falla un
+        temporal no se publicó nada y el lote falla entero. Queda una ventana
+        entre el primer y el último rename: una caída (o un rename que falla) ahí
+        deja unas particiones con el lote y otras sin él, y eso es lo que se lee
+        al recargar.
+        """
+        if False in self._shard_sigs:
+            # Quedó una escritura a medias: partir de lo que realmente hay en disco
+            self._load()
+        # Particiones nuevas aparte: la memoria cambia sólo con lo que llegó a disco
+        shards: Dict[int, Dict[str, Dict[str, Any]]] = {}
+
+        def shard(k: int):
+            if k not in shards:
+                shards[k] = dict(self._shard_links[k])
+            return shards[k]
+
+        for i in puts:
+            shard(_shard_of(i["id"], self.shards))[i["id"]] = i
+        for link_id in deletes:
+            shard(_shard_of(link_id, self.shards)).pop(link_id, None)
+        tmps: Dict[int, str] = {}
+        try:
+            for k in sorted(shards):
+                tmps[k] = self._write_tmp(list(shards[k].values()), self._shard_path(k))
+        except Exception:
+            for tmp in tmps.values():
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+            raise
+        try:
+            for k, tmp in tmps.items():
+                os.replace(tmp, self._shard_path(k))
+                self._shard_links[k] = shards[k]
+                self._shard_sigs[k] = _stat(self._shard_path(k))
+        except Exception:
+            # Rename a medias: releer del disco las particiones del lote la próxima vez
+            for k in shards:
+                self._shard_sigs[k] = False
+            raise
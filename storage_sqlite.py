@@ -0,0 +1,304 @@
+import os, json, uuid, sqlite3, threading
+from typing import List, Optional, Dict, Any, Tuple, Iterator
+from datetime import datetime, timezone
+from pagination import decode_cursor, to_datetime
+from storage import FUZZY_THRESHOLD, _trigrams, _word_similarity
+from search_index import fold
+
+# Filas por lote al exportar
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+_COLUMNS = "id, url, title, tags, notes, created_at, updated_at"
+
+_SCHEMA = [
+    """
+    create table if not exists links(
+      id text primary key,
+      url text not null,
+      title text,
+      tags text not null default '[]',
+      notes text,
+      created_at text not null,
+      updated_at text not null
+    )
+    """,
+    # Orden del listado y paginación por cursor
+    "create index if not exists links_updated_at_id_idx on links (updated_at desc, id desc)",
+    # Etiquetas normalizadas para filtrar por índice (tags en links conserva el orden original)
+    """
+    create table if not exists link_tags(
+      tag text not null,
+      link_id text not null references links(id) on delete cascade,
+      primary key (tag, link_id)
+    ) without rowid
+    """,
+    "create index if not exists link_tags_link_idx on link_tags (link_id)",
+    # Texto completo sin tildes, sincronizado con links mediante triggers
+    """
+    create virtual table if not exists links_fts using fts5(
+      title, url, notes,
+      content='links', content_rowid='rowid',
+      tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    create trigger if not exists links_fts_ai after insert on links begin
+      insert into links_fts(rowid, title, url, notes) values (new.rowid, new.title, new.url, new.notes);
+    end
+    """,
+    """
+    create trigger if not exists links_fts_ad after delete on links begin
+      insert into links_fts(links_fts, rowid, title, url, notes)
+      values ('delete', old.rowid, old.title, old.url, old.notes);
+    end
+    """,
+    """
+    create trigger if not exists links_fts_au after update on links begin
+      insert into links_fts(links_fts, rowid, title, url, notes)
+      values ('delete', old.rowid, old.title, old.url, old.notes);
+      insert into links_fts(rowid, title, url, notes) values (new.rowid, new.title, new.url, new.notes);
+    end
+    """,
+]
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+def _ts(v: Any) -> str:
+    # Texto UTC de ancho fijo: el orden lexicográfico coincide con el cronológico
+    return to_datetime(v).astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+def _fts_query(q: str) -> str:
+    # Cada palabra como frase literal con prefijo ("resoluc"*), unidas con AND implícito
+    terms = [t.replace('"', '""') for t in q.split()]
+    return " ".join(f'"{t}"*' for t in terms if t)
+
+def _record(row: sqlite3.Row) -> Dict[str, Any]:
+    out = dict(row)
+    out["tags"] = json.loads(out.get("tags") or "[]")
+    out["created_at"] = to_datetime(out["created_at"])
+    out["updated_at"] = to_datetime(out["updated_at"])
+    return out
+
+class SqliteStorage:
+    """
+    Backend SQLite (modo WAL) con la misma interfaz que JsonStorage/PgStorage:
+    FTS5 para `q`, tabla link_tags para filtrar etiquetas e índice por fecha.
+    Una conexión por hilo del threadpool.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._conns: List[sqlite3.Connection] = []
+        self._conns_lock = threading.Lock()
+        conn = self._conn()
+        for stmt in _SCHEMA:
+            conn.execute(stmt)
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: autocommit; las escrituras abren su propia transacción
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("pragma journal_mode=wal")
+        conn.execute("pragma synchronous=normal")
+        conn.execute("pragma foreign_keys=on")
+        conn.execute("pragma busy_timeout=5000")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def _write_tx(self):
+        conn = self._conn()
+        conn.execute("begin immediate")
+        return conn
+
+    def _set_tags(self, conn: sqlite3.Connection, link_id: str, tags: List[str]):
+        conn.execute("delete from link_tags where link_id = ?", [link_id])
+        conn.executemany(
+            "insert or ignore into link_tags(tag, link_id) values (?, ?)",
+            [(t, link_id) for t in tags],
+        )
+
+    def list_links(
+        self,
+        limit: int,
+        offset: int,
+        tags: Optional[List[str]],
+        q: Optional[str],
+        cursor: Optional[str] = None,
+        tag_mode: str = "all",
+        match: str = "fts",
+        sort: str = "recent",
+        fuzzy: bool = False,
+        count: str = "exact",
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        # Un q sólo de espacios no tiene términos (match '' es un error en FTS5)
+        q = q.strip() if q else None
+        joins = ""
+        where = []
+        params: List[Any] = []
+        order_sql = "links.updated_at desc, links.id desc"
+
+        if tags:
+            marks = ", ".join("?" * len(tags))
+            if tag_mode == "all":
+                where.append(
+                    f"links.id in (select link_id from link_tags where tag in ({marks}) "
+                    "group by link_id having count(*) = ?)"
+                )
+                params.extend([*tags, len(set(tags))])
+            else:
+                where.append(f"links.id in (select link_id from link_tags where tag in ({marks}))")
+                params.extend(tags)
+        if q and fuzzy:
+            # SQLite no tiene pg_trgm: se puntúa en Python sobre las filas filtradas
+            return self._fuzzy(q, where, params, limit, offset)
+        if q and match == "fts" and _fts_query(q):
+            joins = " join links_fts on links_fts.rowid = links.rowid"
+            where.append("links_fts match ?")
+            params.append(_fts_query(q))
+            if sort == "relevance":
+                order_sql = "bm25(links_fts), " + order_sql
+        elif q:
+            where.append("(links.title like ? or links.url like ? or links.notes like ?)")
+            like = f"%{q}%"
+            params.extend([like, like, like])
+
+        wh = (" where " + " and ".join(where)) if where else ""
+        page_where = list(where)
+        page_params = list(params)
+        if cursor and sort == "recent":
+            ts, link_id = decode_cursor(cursor)
+            page_where.append("(links.updated_at, links.id) < (?, ?)")
+            page_params.extend([_ts(ts), link_id])
+        page_wh = (" where " + " and ".join(page_where)) if page_where else ""
+
+        cols = ", ".join(f"links.{c.strip()}" for c in _COLUMNS.split(","))
+        conn = self._conn()
+        rows = conn.execute(
+            f"select {cols} from links{joins}{page_wh} order by {order_sql} limit ? offset ?",
+            [*page_params, limit, offset],
+        ).fetchall()
+        total = None
+        if count != "none":
+            total = conn.execute(f"select count(*) from links{joins}{wh}", params).fetchone()[0]
+        return [_record(r) for r in rows], total
+
+    def _fuzzy(self, q: str, where: List[str], params: List[Any], limit: int, offset: int):
+        wh = (" where " + " and ".join(where)) if where else ""
+        # Sin tildes ni mayúsculas, igual que la búsqueda aproximada del backend JSON
+        q_trgm = _trigrams(fold(q))
+        scored = []
+        for r in self._conn().execute(f"select {_COLUMNS} from links{wh}", params):
+            score = max(_word_similarity(q_trgm, fold(r[f])) for f in ("title", "url", "notes"))
+            if score >= FUZZY_THRESHOLD:
+                scored.append((score, r["updated_at"], r["id"], r))
+        scored.sort(key=lambda x: x[:3], reverse=True)
+        return [_record(x[3]) for x in scored[offset:offset + limit]], len(scored)
+
+    def create_link(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        return self.create_links_bulk([item])[0]
+
+    def create_links_bulk(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        now = now_utc()
+        out = [
+            {
+                "id": str(uuid.uuid4()),
+                "url": str(it["url"]),
+                "title": it.get("title"),
+                "tags": it.get("tags") or [],
+                "notes": it.get("notes"),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for it in items
+        ]
+        conn = self._write_tx()
+        try:
+            conn.executemany(
+                f"insert into links({_COLUMNS}) values (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (r["id"], r["url"], r["title"], json.dumps(r["tags"], ensure_ascii=False),
+                     r["notes"], _ts(now), _ts(now))
+                    for r in out
+                ],
+            )
+            conn.executemany(
+                "insert or ignore into link_tags(tag, link_id) values (?, ?)",
+                [(t, r["id"]) for r in out for t in r["tags"]],
+            )
+            conn.execute("commit")
+        except Exception:
+            conn.execute("rollback")
+            raise
+        return out
+
+    def get_link(self, link_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(f"select {_COLUMNS} from links where id = ?", [link_id]).fetchone()
+        return _record(row) if row else None
+
+    def update_link(self, link_id: str, patch: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        fields: List[str] = []
+        params: List[Any] = []
+        for k in ("url", "title", "tags", "notes"):
+            if patch.get(k) is not None:
+                v = patch[k]
+                if k == "url":
+                    v = str(v)
+                elif k == "tags":
+                    v = json.dumps(v, ensure_ascii=False)
+                fields.append(f"{k}=?")
+                params.append(v)
+        if not fields:
+            return self.get_link(link_id)
+
+        conn = self._write_tx()
+        try:
+            cur = conn.execute(
+                f"update links set {', '.join(fields + ['updated_at=?'])} where id=?",
+                [*params, _ts(now_utc()), link_id],
+            )
+            if cur.rowcount and patch.get("tags") is not None:
+                self._set_tags(conn, link_id, patch["tags"])
+            conn.execute("commit")
+        except Exception:
+            conn.execute("rollback")
+            raise
+        return self.get_link(link_id) if cur.rowcount else None
+
+    def delete_link(self, link_id: str) -> bool:
+        # link_tags se borra en cascada y el trigger limpia el índice FTS
+        conn = self._conn()
+        return conn.execute("delete from links where id = ?", [link_id]).rowcount > 0
+
+    def export_all(self) -> List[Dict[str, Any]]:
+        return [r for batch in self.iter_export() for r in batch]
+
+    def iter_export(self, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+        # Conexión propia: el streaming puede avanzar desde distintos hilos del threadpool.
+        # En WAL la lectura ve una instantánea fija mientras se recorre.
+        conn = self._connect()
+        try:
+            cur = conn.execute(f"select {_COLUMNS} from links order by updated_at desc, id desc")
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [_record(r) for r in rows]
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns.clear()
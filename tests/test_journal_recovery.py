@@ -0,0 +1,60 @@
+import os, sys, json, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage_journal import JournalStorage
+
+
+class JournalRecoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "links.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_torn_tail_is_truncated_before_next_append(self):
+        s = JournalStorage(self.path)
+        first = s.create_link({"url": "https://a.com", "title": "a"})
+        s.close()
+        # Caída a mitad de append
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write('{"op": "put", "link": {"id": "x')
+
+        s = JournalStorage(self.path)
+        self.assertEqual([i["id"] for i in s.export_all()], [first["id"]])
+        b = s.create_link({"url": "https://b.com"})
+        c = s.create_link({"url": "https://c.com"})
+        s.close()
+
+        s = JournalStorage(self.path)
+        ids = {i["id"] for i in s.export_all()}
+        s.close()
+        self.assertEqual(ids, {first["id"], b["id"], c["id"]})
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                json.loads(line)
+
+    def test_complete_line_without_newline(self):
+        s = JournalStorage(self.path)
+        s.close()
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write('{"op": "put", "link": {"id": "x", "url": "https://x.com"}}')
+
+        s = JournalStorage(self.path)
+        y = s.create_link({"url": "https://y.com"})
+        s.close()
+
+        s = JournalStorage(self.path)
+        self.assertEqual({i["id"] for i in s.export_all()}, {"x", y["id"]})
+        s.close()
+
+    def test_corruption_before_the_tail_is_an_error(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write('{"op": "put", "link": {"id": "x\n{"op": "del", "id": "y"}\n')
+        with self.assertRaises(json.JSONDecodeError):
+            JournalStorage(self.path).export_all()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import os, sys, random, unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persistent import CowMap, CowSortedList
+from search_index import InvertedIndex
+from storage import _Snapshot, _order_key, _search_key, _index_text, _tag_index
+
+
+class CowMapTest(unittest.TestCase):
+    def test_copy_isolation(self):
+        a = CowMap((k, k) for k in range(500))
+        b = a.copy()
+        b[1] = "b"
+        b.pop(2)
+        b[1000] = 1000
+        self.assertEqual((a[1], a.get(2), 1000 in a, len(a)), (1, 2, False, 500))
+        # El original también puede seguir cambiando sin afectar a la copia
+        a[3] = "a"
+        self.assertEqual((b[3], b[1], b.get(2), len(b)), (3, "b", None, 500))
+
+    def test_random_against_dict(self):
+        rnd = random.Random(17)
+        m, d = CowMap(), {}
+        copies = []
+        for n in range(5000):
+            k = rnd.randrange(800)
+            if rnd.random() < 0.3:
+                self.assertEqual(m.pop(k, None), d.pop(k, None))
+            else:
+                m[k] = d[k] = n
+            if n % 500 == 0:
+                copies.append((m, dict(d)))
+                m = m.copy()
+        for c, expected in copies + [(m, d)]:
+            self.assertEqual(dict(c.items()), expected)
+            self.assertEqual(len(c), len(expected))
+
+
+class CowSortedListTest(unittest.TestCase):
+    def setUp(self):
+        # Bloques chicos para que los cortes y los bloques vacíos ocurran seguido
+        patcher = mock.patch.object(CowSortedList, "CHUNK", 4)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def check(self, s: CowSortedList, keys):
+        keys = sorted(keys)
+        self.assertEqual(len(s), len(keys))
+        self.assertEqual([k for k, _ in s.iter_desc()], keys[::-1])
+        self.assertEqual([k for k, _ in s.iter_from(-1)], keys)
+
+    def test_random_add_remove_against_sorted_list(self):
+        rnd = random.Random(5)
+        s, keys = CowSortedList(), []
+        snapshots = []
+        for n in range(3000):
+            if keys and rnd.random() < 0.45:
+                k = rnd.choice(keys)
+                keys.remove(k)
+                s.remove(k)
+            else:
+                k = rnd.randrange(10 ** 6)
+                if k in keys:
+                    continue
+                keys.append(k)
+                s.add(k, str(k))
+            if n % 300 == 0:
+                snapshots.append((s, list(keys)))
+                s = s.copy()
+        for snap, expected in snapshots + [(s, keys)]:
+            self.check(snap, expected)
+        self.assertTrue(all(v == str(k) for k, v in s.iter_desc()))
+
+    def test_remove_until_empty(self):
+        s = CowSortedList((k, k) for k in range(40))
+        c = s.copy()
+        for k in range(40):
+            s.remove(k)
+        self.check(s, [])
+        self.check(c, range(40))
+        with self.assertRaises(KeyError):
+            s.remove(1)
+        s.add(7, 7)
+        self.check(s, [7])
+
+    def test_missing_key_raises(self):
+        s = CowSortedList((k, k) for k in range(0, 40, 2))
+        for k in (-1, 3, 39, 100):
+            with self.assertRaises(KeyError):
+                s.remove(k)
+        self.check(s, range(0, 40, 2))
+
+    def test_iter_bounds(self):
+        keys = list(range(0, 60, 2))
+        s = CowSortedList((k, k) for k in keys)
+        for before in [-5, 0, 1, 2, 7, 8, 9, 58, 59, 100]:
+            self.assertEqual(
+                [k for k, _ in s.iter_desc(before)], [k for k in reversed(keys) if k < before], before
+            )
+        for start in [-5, 0, 1, 8, 9, 58, 59, 100]:
+            self.assertEqual([k for k, _ in s.iter_from(start)], [k for k in keys if k >= start], start)
+        self.assertEqual(list(CowSortedList().iter_desc(3)), [])
+        self.assertEqual(list(CowSortedList().iter_from(3)), [])
+
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+WORDS = ["resolución", "ley", "decreto", "corte", "fallo", "norma"]
+TAGS = ["a", "b", "c", "d"]
+
+
+def _record(rnd, link_id, n):
+    return {
+        "id": link_id,
+        "url": f"https://{rnd.choice(WORDS)}.com/{n}",
+        "title": " ".join(rnd.sample(WORDS, 2)),
+        "notes": rnd.choice([None, rnd.choice(WORDS)]),
+        "tags": rnd.sample(TAGS, rnd.randint(0, 2)),
+        "updated_at": T0 + timedelta(seconds=rnd.randrange(50)),
+    }
+
+
+class SnapshotEvolveTest(unittest.TestCase):
+    def assertConsistent(self, snap: _Snapshot, by_id):
+        items = sorted(by_id.values(), key=_order_key)
+        self.assertEqual(dict(snap.by_id.items()), by_id)
+        self.assertEqual([i for _, i in snap.order.iter_desc()], items[::-1])
+        tags = {t: set(ids) for t, ids in snap.tags.items()}
+        self.assertEqual(tags, {t: set(ids) for t, ids in _tag_index(items).items()})
+        self.assertEqual(dict(snap.search.items()), {i["id"]: _search_key(i) for i in items})
+        fresh = InvertedIndex()
+        for i in items:
+            fresh.add(i["id"], _index_text(i))
+        self.assertEqual(dict(snap.index.doc_terms.items()), dict(fresh.doc_terms.items()))
+        self.assertEqual(
+            {t: dict(p.items()) for t, p in snap.index.postings.items()},
+            {t: dict(p.items()) for t, p in fresh.postings.items()},
+        )
+        self.assertEqual([t for t, _ in snap.index.vocab.iter_from("")], sorted(fresh.postings))
+        self.assertEqual(snap.index.total_len, fresh.total_len)
+
+    def test_random_batches(self):
+        rnd = random.Random(3)
+        by_id = {f"id{n}": _record(rnd, f"id{n}", n) for n in range(30)}
+        snap = _Snapshot(dict(by_id), None)
+        history = [(snap, dict(by_id))]
+        for n in range(60):
+            work = snap.by_id.copy()
+            puts, deletes = {}, set()
+            for _ in range(rnd.randint(1, 6)):
+                if work and rnd.random() < 0.3:
+                    link_id = rnd.choice(list(work.keys()))
+                    work.pop(link_id)
+                    puts.pop(link_id, None)
+                    deletes.add(link_id)
+                else:
+                    link_id = rnd.choice(list(work.keys()) + [f"new{n}-{len(puts)}"])
+                    work[link_id] = puts[link_id] = _record(rnd, link_id, n)
+                    deletes.discard(link_id)
+            snap = snap.evolve(work, puts, deletes)
+            for link_id in deletes:
+                by_id.pop(link_id, None)
+            by_id.update(puts)
+            history.append((snap, dict(by_id)))
+        # Los snapshots anteriores siguen intactos después de todas las escrituras
+        for s, expected in history:
+            self.assertConsistent(s, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()